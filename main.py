@@ -14,40 +14,157 @@ Features:
 - Inline keyboards for user-friendly interaction.
 - Dynamic calendar for date selection.
 - Error logging for troubleshooting.
+- Metrics of handler and API latency on /metrics, if METRICS_PORT is set.
 
 Usage:
 Run this script to start the bot. Interact with the bot in Telegram by sending
 commands like /start and following the prompts.
+
+To expose the metrics from the Docker container, set METRICS_LISTEN=0.0.0.0
+and METRICS_PORT, e.g. 9464, in .env and publish the port in
+docker-compose.yml, e.g. ``ports: ["127.0.0.1:9464:9464"]``.
+
+By default the bot polls Telegram for updates. Set BOT_MODE=webhook,
+WEBHOOK_URL and WEBHOOK_SECRET to receive the updates through the embedded
+webhook server instead, e.g. behind a reverse proxy. Run a single instance
+of the bot in either mode: conversation states and the outbox are kept in
+its local database.
 """
+import functools
 import logging
 import os
 from datetime import datetime
 
-import urllib3
 from dotenv import load_dotenv
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
 from telegram.ext import (Application, CallbackContext, CallbackQueryHandler,
                           CommandHandler, ConversationHandler, MessageHandler,
-                          filters)
+                          TypeHandler, filters)
 
 import modules.constants
 from modules.api import ask_for_currency, get_accounts, post_transaction
-from modules.auth import authenticate_user
+from modules.auth import (TokenStore, get_token, renew_token,
+                          restore_credentials)
+from modules.cache import TTLCache, invalidate_reference_data
+from modules.callbacks import CallbackDispatcher, decode, encode
+from modules.client import ApiClient
 from modules.handlers import (handle_account_selection, handle_account_status,
                               handle_calendar_callback,
                               handle_category_selection, handle_family_status,
-                              handle_profile, handle_who_selection)
-from modules.transactions import add_transaction, receive_title
+                              handle_page, handle_profile,
+                              handle_who_selection, search_categories)
+from modules.metrics import OUTBOX_PENDING, start_metrics_server, timed_handler
+from modules.outbox import Outbox
+from modules.persistence import SQLitePersistence
+from modules.storage import connect
+from modules.tracing import configure as configure_tracing
+from modules.tracing import end_trace, traced
+from modules.transactions import add_transaction, quick_add, receive_title
+from modules.update_processor import OrderedUpdateProcessor
 from modules.user_management import get_users
-from modules.utils import create_calendar
-
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+from modules.utils import create_calendar, warm_calendar_cache
 
 load_dotenv()
 
 modules.constants.API_BASE_URL = os.getenv('API_BASE_URL')
 modules.constants.API_TOKEN = os.getenv('API_TOKEN')
 modules.constants.TELEGRAM_TOKEN = os.getenv('TELEGRAM_TOKEN')
+modules.constants.API_TIMEOUT = float(
+    os.getenv('API_TIMEOUT', modules.constants.API_TIMEOUT))
+modules.constants.API_CONNECT_TIMEOUT = float(
+    os.getenv('API_CONNECT_TIMEOUT', modules.constants.API_CONNECT_TIMEOUT))
+modules.constants.API_MAX_CONNECTIONS = int(
+    os.getenv('API_MAX_CONNECTIONS', modules.constants.API_MAX_CONNECTIONS))
+modules.constants.API_MAX_KEEPALIVE_CONNECTIONS = int(
+    os.getenv('API_MAX_KEEPALIVE_CONNECTIONS',
+              modules.constants.API_MAX_KEEPALIVE_CONNECTIONS))
+modules.constants.API_KEEPALIVE_EXPIRY = float(
+    os.getenv('API_KEEPALIVE_EXPIRY', modules.constants.API_KEEPALIVE_EXPIRY))
+modules.constants.API_RETRY_ATTEMPTS = int(
+    os.getenv('API_RETRY_ATTEMPTS', modules.constants.API_RETRY_ATTEMPTS))
+modules.constants.API_RETRY_DELAY = float(
+    os.getenv('API_RETRY_DELAY', modules.constants.API_RETRY_DELAY))
+modules.constants.API_RETRY_MAX_DELAY = float(
+    os.getenv('API_RETRY_MAX_DELAY', modules.constants.API_RETRY_MAX_DELAY))
+modules.constants.API_CIRCUIT_FAILURE_THRESHOLD = int(
+    os.getenv('API_CIRCUIT_FAILURE_THRESHOLD',
+              modules.constants.API_CIRCUIT_FAILURE_THRESHOLD))
+modules.constants.API_CIRCUIT_RESET_TIMEOUT = float(
+    os.getenv('API_CIRCUIT_RESET_TIMEOUT',
+              modules.constants.API_CIRCUIT_RESET_TIMEOUT))
+modules.constants.API_VALIDATOR_CACHE_SIZE = int(
+    os.getenv('API_VALIDATOR_CACHE_SIZE',
+              modules.constants.API_VALIDATOR_CACHE_SIZE))
+modules.constants.REFERENCE_CACHE_TTL = float(
+    os.getenv('REFERENCE_CACHE_TTL', modules.constants.REFERENCE_CACHE_TTL))
+modules.constants.REFERENCE_CACHE_SIZE = int(
+    os.getenv('REFERENCE_CACHE_SIZE', modules.constants.REFERENCE_CACHE_SIZE))
+modules.constants.STATUS_SCREEN_TIMEOUT = float(
+    os.getenv('STATUS_SCREEN_TIMEOUT',
+              modules.constants.STATUS_SCREEN_TIMEOUT))
+modules.constants.KEYBOARD_PAGE_SIZE = int(
+    os.getenv('KEYBOARD_PAGE_SIZE', modules.constants.KEYBOARD_PAGE_SIZE))
+modules.constants.KEYBOARD_SEARCH_RESULTS = int(
+    os.getenv('KEYBOARD_SEARCH_RESULTS',
+              modules.constants.KEYBOARD_SEARCH_RESULTS))
+modules.constants.CATEGORY_SUGGESTIONS = int(
+    os.getenv('CATEGORY_SUGGESTIONS', modules.constants.CATEGORY_SUGGESTIONS))
+modules.constants.CATEGORY_MODEL_TTL = float(
+    os.getenv('CATEGORY_MODEL_TTL', modules.constants.CATEGORY_MODEL_TTL))
+modules.constants.CATEGORY_MODEL_CACHE_SIZE = int(
+    os.getenv('CATEGORY_MODEL_CACHE_SIZE',
+              modules.constants.CATEGORY_MODEL_CACHE_SIZE))
+modules.constants.CALENDAR_LOCALE = os.getenv('CALENDAR_LOCALE')
+modules.constants.CALENDAR_FIRSTWEEKDAY = int(
+    os.getenv('CALENDAR_FIRSTWEEKDAY',
+              modules.constants.CALENDAR_FIRSTWEEKDAY))
+modules.constants.BULK_TRANSACTION_PATH = os.getenv(
+    'BULK_TRANSACTION_PATH', modules.constants.BULK_TRANSACTION_PATH)
+modules.constants.DATABASE_PATH = os.getenv(
+    'DATABASE_PATH', modules.constants.DATABASE_PATH)
+modules.constants.TOKEN_TTL = float(
+    os.getenv('TOKEN_TTL', modules.constants.TOKEN_TTL))
+modules.constants.PERSISTENCE_UPDATE_INTERVAL = float(
+    os.getenv('PERSISTENCE_UPDATE_INTERVAL',
+              modules.constants.PERSISTENCE_UPDATE_INTERVAL))
+modules.constants.PERSISTENCE_WRITE_DELAY = float(
+    os.getenv('PERSISTENCE_WRITE_DELAY',
+              modules.constants.PERSISTENCE_WRITE_DELAY))
+modules.constants.PERSISTENCE_COMPACT_INTERVAL = float(
+    os.getenv('PERSISTENCE_COMPACT_INTERVAL',
+              modules.constants.PERSISTENCE_COMPACT_INTERVAL))
+modules.constants.OUTBOX_BATCH_SIZE = int(
+    os.getenv('OUTBOX_BATCH_SIZE', modules.constants.OUTBOX_BATCH_SIZE))
+modules.constants.OUTBOX_RETRY_DELAY = float(
+    os.getenv('OUTBOX_RETRY_DELAY', modules.constants.OUTBOX_RETRY_DELAY))
+modules.constants.OUTBOX_MAX_RETRY_DELAY = float(
+    os.getenv('OUTBOX_MAX_RETRY_DELAY',
+              modules.constants.OUTBOX_MAX_RETRY_DELAY))
+modules.constants.OUTBOX_MAX_ATTEMPTS = int(
+    os.getenv('OUTBOX_MAX_ATTEMPTS', modules.constants.OUTBOX_MAX_ATTEMPTS))
+modules.constants.OUTBOX_POLL_INTERVAL = float(
+    os.getenv('OUTBOX_POLL_INTERVAL',
+              modules.constants.OUTBOX_POLL_INTERVAL))
+modules.constants.BOT_MODE = os.getenv('BOT_MODE', modules.constants.BOT_MODE)
+modules.constants.WEBHOOK_LISTEN = os.getenv(
+    'WEBHOOK_LISTEN', modules.constants.WEBHOOK_LISTEN)
+modules.constants.WEBHOOK_PORT = int(
+    os.getenv('WEBHOOK_PORT', modules.constants.WEBHOOK_PORT))
+modules.constants.WEBHOOK_PATH = os.getenv(
+    'WEBHOOK_PATH', modules.constants.WEBHOOK_PATH)
+modules.constants.WEBHOOK_URL = os.getenv('WEBHOOK_URL')
+modules.constants.WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET')
+modules.constants.WEBHOOK_MAX_CONNECTIONS = int(
+    os.getenv('WEBHOOK_MAX_CONNECTIONS',
+              modules.constants.WEBHOOK_MAX_CONNECTIONS))
+modules.constants.MAX_CONCURRENT_UPDATES = int(
+    os.getenv('MAX_CONCURRENT_UPDATES',
+              modules.constants.MAX_CONCURRENT_UPDATES))
+modules.constants.METRICS_LISTEN = os.getenv(
+    'METRICS_LISTEN', modules.constants.METRICS_LISTEN)
+modules.constants.METRICS_PORT = int(
+    os.getenv('METRICS_PORT', modules.constants.METRICS_PORT))
+modules.constants.TRACE_EXPORTER = os.getenv('TRACE_EXPORTER')
 
 logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
@@ -56,6 +173,7 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+@timed_handler
 async def start(update: Update, context: CallbackContext):
     """
     Handle the /start command.
@@ -63,18 +181,18 @@ async def start(update: Update, context: CallbackContext):
     Sends a message with a keyboard offering different transaction options.
     """
     telegram_user_id = update.effective_user.id
-    token = authenticate_user(telegram_user_id)
+    token = await get_token(context, telegram_user_id)
     if token:
         context.user_data['api_token'] = token
         keyboard = [
             [InlineKeyboardButton("Add Transaction",
-                                  callback_data='add_transaction')],
+                                  callback_data=encode('add_transaction'))],
             [InlineKeyboardButton("Account Status",
-                                  callback_data='account_status')],
+                                  callback_data=encode('account_status'))],
             [InlineKeyboardButton("Family Status",
-                                  callback_data='family_status')],
+                                  callback_data=encode('family_status'))],
             [InlineKeyboardButton("Profile",
-                                  callback_data='profile')]
+                                  callback_data=encode('profile'))]
         ]
         reply_markup = InlineKeyboardMarkup(keyboard)
         await update.message.reply_text(
@@ -83,6 +201,20 @@ async def start(update: Update, context: CallbackContext):
         await update.message.reply_text("Authentication failed.")
 
 
+@timed_handler
+async def refresh(update: Update, context: CallbackContext):
+    """
+    Handle the /refresh command.
+
+    Drops the cached categories, currencies and users of the user, so the
+    next steps fetch fresh data from the API.
+    """
+    invalidate_reference_data(context)
+    await update.message.reply_text('Reference data refreshed.')
+
+
+@timed_handler
+@traced
 async def cancel(update: Update, context: CallbackContext):
     """
     Handle the /cancel command to abort an ongoing transaction process.
@@ -102,6 +234,7 @@ async def cancel(update: Update, context: CallbackContext):
         int: The end state of the conversation handler, signaling the
         termination of the current conversation flow.
     """
+    end_trace(context, 'cancelled')
     await update.message.reply_text('Transaction addition cancelled.')
     return ConversationHandler.END
 
@@ -112,12 +245,12 @@ async def receive_category(update: Update, context: CallbackContext):
 
     Prompts for selecting the user involved after choosing the category.
     """
-    context.user_data['transaction_data']['category'] = (
-        update.callback_query.data.split("_")[1])
-    users = get_users(context)
+    context.user_data['transaction_data']['category'] = str(
+        decode(update.callback_query.data).args[0])
+    users = await get_users(context)
     keyboard = [
         [InlineKeyboardButton(user['username'],
-                              callback_data=f"who_{user['id']}")]
+                              callback_data=encode('who', user['id']))]
         for user in users
     ]
     reply_markup = InlineKeyboardMarkup(keyboard)
@@ -136,7 +269,7 @@ async def receive_who(update: Update, context: CallbackContext):
     text = update.message.text
     context.user_data['transaction_data']['who'] = text
     await update.message.reply_text("Select an account:")
-    accounts = get_accounts(context)
+    accounts = await get_accounts(context)
     for account in accounts:
         account_display = f"{account['title']} - {account['username']}"
         await update.message.reply_text(account_display)
@@ -156,6 +289,8 @@ async def receive_account(update: Update, context: CallbackContext):
     return modules.constants.AMOUNT
 
 
+@timed_handler
+@traced
 async def receive_amount(update: Update, context: CallbackContext):
     """
     Receive the transaction amount from the user.
@@ -177,13 +312,15 @@ async def receive_date(update: Update, context: CallbackContext):
     text = update.message.text
     context.user_data['transaction_data']['date'] = text
     data = context.user_data['transaction_data']
-    if post_transaction(data):
+    if await post_transaction(data, context):
         await update.message.reply_text("Transaction successfully added.")
     else:
         await update.message.reply_text("Transaction failed to add.")
     return ConversationHandler.END
 
 
+@timed_handler
+@traced
 async def receive_currency(update: Update, context: CallbackContext):
     """
     Handle the user's currency selection.
@@ -199,7 +336,7 @@ async def receive_currency(update: Update, context: CallbackContext):
     query = update.callback_query
     await query.answer()
 
-    currency_id = query.data.split("_")[1]
+    currency_id = str(decode(query.data).args[0])
     context.user_data['transaction_data']['currency'] = currency_id
 
     if query.message:
@@ -212,6 +349,24 @@ async def receive_currency(update: Update, context: CallbackContext):
     return await ask_for_date(update, context)
 
 
+@timed_handler
+async def ignore(update: Update, context: CallbackContext):
+    """Answer presses of buttons that do nothing, e.g. calendar headers."""
+    await update.callback_query.answer()
+
+
+@timed_handler
+async def expired_button(update: Update, context: CallbackContext):
+    """
+    Answer presses of buttons that are no longer active.
+
+    These are buttons of a transaction that was finished or cancelled, or
+    of an earlier step of the current one. They are answered with a short
+    notice without contacting the API.
+    """
+    await update.callback_query.answer("This button is no longer active.")
+
+
 async def error(update: Update, context: CallbackContext):
     """Log errors caused by Updates."""
     logger.warning('Update "%s" caused error "%s"', update, context.error)
@@ -235,70 +390,205 @@ async def ask_for_date(update: Update, context: CallbackContext):
     return modules.constants.DATE
 
 
+async def notify_sent_transaction(application: Application, entry, status):
+    """Tell the user that a saved transaction was stored by the API."""
+    if entry['chat_id'] is None:
+        return
+    await application.bot.send_message(
+        entry['chat_id'],
+        f"Transaction \"{entry['payload'].get('title', '')}\" added.")
+
+
+async def notify_failed_transaction(application: Application, entry, status):
+    """
+    Tell the user that a saved transaction could not be delivered.
+
+    Also drops the cached reference data of the user, since the transaction
+    may refer to data that no longer exists.
+    """
+    application.bot_data['reference_cache'].invalidate_scope(entry['token'])
+    if entry['chat_id'] is None:
+        return
+    await application.bot.send_message(
+        entry['chat_id'],
+        f"Transaction \"{entry['payload'].get('title', '')}\" failed to add"
+        f" (status: {status}).")
+
+
+async def post_init(application: Application):
+    """
+    Start delivering saved transactions and prepare the calendars.
+
+    Also starts the metrics endpoint unless METRICS_PORT is 0, and the
+    export of traces if TRACE_EXPORTER is set.
+    """
+    warm_calendar_cache(datetime.today())
+    configure_tracing(modules.constants.TRACE_EXPORTER)
+    outbox = application.bot_data['outbox']
+    outbox.start(
+        application.bot_data['api_client'],
+        functools.partial(notify_failed_transaction, application),
+        functools.partial(notify_sent_transaction, application))
+    OUTBOX_PENDING.function = outbox.pending_count
+    if modules.constants.METRICS_PORT:
+        application.bot_data['metrics_server'] = await start_metrics_server(
+            modules.constants.METRICS_LISTEN, modules.constants.METRICS_PORT)
+
+
+async def shutdown(application: Application):
+    """Stop the outbox worker and close API and database connections."""
+    metrics_server = application.bot_data.pop('metrics_server', None)
+    if metrics_server is not None:
+        metrics_server.close()
+        await metrics_server.wait_closed()
+    await application.bot_data['outbox'].stop()
+    configure_tracing(None)
+    await application.bot_data['api_client'].aclose()
+    application.bot_data['database'].close()
+
+
 def main():
     """
     Create and run the bot application.
 
     Sets up handlers and starts the bot.
     """
-    application = Application.builder().token(
-        modules.constants.TELEGRAM_TOKEN).build()
+    run(build_application())
+
+
+def build_application(request=None):
+    """
+    Create the bot application and set up its handlers.
 
+    Args:
+        request (BaseRequest): Optional object sending the requests to the
+            Telegram Bot API, e.g. a stand-in used for load testing.
+
+    Returns:
+        Application: The application, ready to be run.
+    """
+    database = connect(modules.constants.DATABASE_PATH)
+    builder = (
+        Application.builder()
+        .token(modules.constants.TELEGRAM_TOKEN)
+        .concurrent_updates(OrderedUpdateProcessor(
+            modules.constants.MAX_CONCURRENT_UPDATES))
+        .persistence(SQLitePersistence(database))
+        .post_init(post_init)
+        .post_shutdown(shutdown))
+    if request is not None:
+        builder = builder.request(request)
+    application = builder.build()
+    api_client = ApiClient(modules.constants.API_BASE_URL)
+    token_store = TokenStore(database)
+    api_client.reauthenticate = functools.partial(
+        renew_token, api_client, token_store)
+    application.bot_data['database'] = database
+    application.bot_data['api_client'] = api_client
+    application.bot_data['token_store'] = token_store
+    application.bot_data['reference_cache'] = TTLCache(
+        maxsize=modules.constants.REFERENCE_CACHE_SIZE,
+        ttl=modules.constants.REFERENCE_CACHE_TTL, name='reference')
+    application.bot_data['category_models'] = TTLCache(
+        maxsize=modules.constants.CATEGORY_MODEL_CACHE_SIZE,
+        ttl=modules.constants.CATEGORY_MODEL_TTL, name='category_models')
+    application.bot_data['outbox'] = Outbox(database)
+
+    # Every callback action has exactly one owner; claiming or registering
+    # an action twice fails here instead of running two handlers per press.
+    dispatcher = CallbackDispatcher(fallback=expired_button)
+    claim = functools.partial(dispatcher.claim, 'add_transaction')
     conv_handler = ConversationHandler(
         entry_points=[CallbackQueryHandler(
-            add_transaction, pattern='^add_transaction$')],
+            add_transaction, pattern=claim('add_transaction'))],
         states={
             modules.constants.TITLE: [MessageHandler(
                 filters.TEXT, receive_title)],
             modules.constants.CATEGORY: [
                 CallbackQueryHandler(handle_category_selection,
-                                     pattern='^category_')],
+                                     pattern=claim('category')),
+                CallbackQueryHandler(handle_page,
+                                     pattern=claim('category_page')),
+                MessageHandler(filters.TEXT & ~filters.COMMAND,
+                               search_categories)],
             modules.constants.WHO: [
-                CallbackQueryHandler(handle_who_selection, pattern='^who_')],
+                CallbackQueryHandler(handle_who_selection,
+                                     pattern=claim('who')),
+                CallbackQueryHandler(handle_page,
+                                     pattern=claim('who_page'))],
             modules.constants.ACCOUNT: [
                 CallbackQueryHandler(handle_account_selection,
-                                     pattern='^account_')],
+                                     pattern=claim('account')),
+                CallbackQueryHandler(handle_page,
+                                     pattern=claim('account_page'))],
             modules.constants.AMOUNT: [
                 MessageHandler(filters.TEXT, receive_amount)],
             modules.constants.CURRENCY: [
                 CallbackQueryHandler(receive_currency,
-                                     pattern='^currency_')],
+                                     pattern=claim('currency'))],
             modules.constants.DATE: [
                 CallbackQueryHandler(handle_calendar_callback,
-                                     pattern='^calendar-')]
+                                     pattern=claim('calendar_day',
+                                                   'calendar_month'))]
         },
         fallbacks=[CommandHandler('cancel', cancel)],
+        name='add_transaction',
+        persistent=True,
         per_chat=True,
         per_user=True,
         per_message=False
     )
 
-    category_handler = CallbackQueryHandler(
-        handle_category_selection, pattern='^category_')
-    who_handler = CallbackQueryHandler(handle_who_selection, pattern='^who_')
-    currency_handler = CallbackQueryHandler(receive_currency,
-                                            pattern='^currency_')
+    dispatcher.register('account_status', handle_account_status)
+    dispatcher.register('profile', handle_profile)
+    dispatcher.register('family_status', handle_family_status)
+    dispatcher.register('ignore', ignore)
+    if dispatcher.unowned():
+        raise ValueError(f"Callback actions without a handler: "
+                         f"{', '.join(dispatcher.unowned())}")
     cancel_handler = CommandHandler('cancel', cancel)
-    account_status_handler = CallbackQueryHandler(handle_account_status,
-                                                  pattern='^account_status$')
-    profile_handler = CallbackQueryHandler(handle_profile, pattern='^profile$')
-    family_status_handler = CallbackQueryHandler(handle_family_status,
-                                                 pattern='^family_status$')
 
+    application.add_handler(TypeHandler(Update, restore_credentials),
+                            group=-1)
     application.add_handler(CommandHandler('start', start))
+    application.add_handler(CommandHandler('refresh', refresh))
+    application.add_handler(CommandHandler('add', quick_add))
     application.add_handler(conv_handler)
-    application.add_handler(category_handler)
-    application.add_handler(who_handler)
-    application.add_handler(account_status_handler)
     application.add_handler(CallbackQueryHandler(
-        handle_calendar_callback,
-        pattern="^calendar-"))
-    application.add_handler(currency_handler)
-    application.add_handler(profile_handler)
+        dispatcher.dispatch, pattern=dispatcher.pattern))
     application.add_handler(cancel_handler)
-    application.add_handler(family_status_handler)
     application.add_error_handler(error)
-    application.run_polling()
+    return application
+
+
+def run(application: Application):
+    """
+    Start receiving updates in the configured mode.
+
+    In webhook mode the embedded webhook server only accepts updates that
+    carry WEBHOOK_SECRET. Conversation states and the outbox live in the
+    local database, so a single instance must receive all updates.
+
+    Raises:
+        ValueError: If WEBHOOK_URL or WEBHOOK_SECRET is missing in webhook
+            mode.
+    """
+    constants = modules.constants
+    if constants.BOT_MODE != 'webhook':
+        application.run_polling()
+        return
+    if not constants.WEBHOOK_URL:
+        raise ValueError("WEBHOOK_URL is required in webhook mode")
+    if not constants.WEBHOOK_SECRET:
+        raise ValueError("WEBHOOK_SECRET is required in webhook mode")
+    application.run_webhook(
+        listen=constants.WEBHOOK_LISTEN,
+        port=constants.WEBHOOK_PORT,
+        url_path=constants.WEBHOOK_PATH,
+        webhook_url=(f"{constants.WEBHOOK_URL.rstrip('/')}/"
+                     f"{constants.WEBHOOK_PATH}"),
+        secret_token=constants.WEBHOOK_SECRET,
+        max_connections=constants.WEBHOOK_MAX_CONNECTIONS)
 
 
 if __name__ == '__main__':
@@ -11,35 +11,52 @@ ensuring separation of concerns.
 Functions:
     get_accounts(context, api_base_url): Fetches and returns a list of accounts
     with associated usernames.
+    get_account_choices(context): Returns the cached accounts of the family
+    for account selection.
+    get_account_keyboard(context): Returns the cached accounts of the family
+    as Choices labelled with the owner's username.
     get_currencies(context, api_base_url): Retrieves available currencies from
     the API.
     ask_for_currency(update, context, api_base_url): Prompts the user to
     select a currency.
     get_categories(context, api_base_url): Fetches and returns the list of
     categories.
+    get_category_choices(context): Returns the cached categories as Choices
+    for paged and searchable keyboards.
     post_transaction(data, context, api_base_url): Posts transaction data to
     the API.
+    submit_transaction(client, token, data, idempotency_key): Posts a single
+    transaction on behalf of a token and returns the response status.
+    submit_transactions(client, token, items): Posts many transactions in one
+    bulk request and returns the status of each of them.
+
+All API calls are coroutines sent through the shared asynchronous client
+from modules.client, so they must be awaited by the handlers.
 """
+import asyncio
 import logging
 
-import requests
-import urllib3
+import httpx
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
 from telegram.ext import CallbackContext
 
 import modules.constants
-from modules.user_management import get_user_mapping
-
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+from modules.cache import (fetch_reference, get_reference_cache,
+                           invalidate_reference_data)
+from modules.callbacks import encode
+from modules.client import fetch_json, get_client, reauthenticate
+from modules.keyboards import Choices
+from modules.user_management import get_user_directory
 
 
-def get_accounts(context, user_id=None):
+async def get_accounts(context, user_id=None):
     """
     Fetch and return the list of accounts from the API.
 
     This function includes the associated username with each account.
     It returns a list of account details, each including the username
-    of the owner.
+    of the owner. The accounts and the user directory are fetched
+    concurrently, and the directory is shared with the other handlers.
 
     Args:
         context (CallbackContext): The context of the bot.
@@ -49,44 +66,66 @@ def get_accounts(context, user_id=None):
         list: A list of account details, each including the username of
         the owner.
     """
-    url = f"{modules.constants.API_BASE_URL}/account/"
-    if user_id is not None:
-        url += f"?owner={user_id}"
-
-    user_mapping = get_user_mapping(context)
-    headers = {'Authorization': f'Token {context.user_data.get("api_token")}'}
-    response = requests.get(url, headers=headers, verify=False)
-    if response.status_code == 200:
-        accounts = response.json()
-        for account in accounts:
-            owner_id = account.get('owner')
-            account['username'] = user_mapping.get(owner_id, 'Unknown')
-        return accounts
-    else:
-        logging.error(f"Failed to fetch accounts: {response.status_code}")
-        return []
+    params = {'owner': user_id} if user_id is not None else None
+
+    directory, accounts = await asyncio.gather(
+        get_user_directory(context),
+        fetch_json(context, "/account/", "accounts", [], params=params))
+    # The fetched accounts are shared with other callers, so the usernames
+    # are added to copies.
+    return [dict(account, username=directory.username(account.get('owner')))
+            for account in accounts]
+
+
+async def get_account_choices(context):
+    """
+    Fetch the family's accounts for selection, using the cache.
+
+    Unlike get_accounts, the list comes from the reference data cache, so
+    the balances may be outdated. Use it only to let users pick an account.
+
+    Returns:
+        list: A list of account details without usernames.
+    """
+    return await fetch_reference(context, "/account/", "accounts")
+
+
+async def get_account_keyboard(context):
+    """
+    Return the family's accounts for the account keyboard.
 
+    Built from the cached accounts and user directory and cached itself, so
+    paging through the accounts does not rebuild the keyboard.
 
-def get_currencies(context):
+    Returns:
+        Choices: Accounts labelled "<Account title> - <Username>".
+    """
+    cache = get_reference_cache(context)
+    key = (context.user_data.get("api_token"), "account keyboard")
+    choices = cache.get(key)
+    if choices is None:
+        accounts, directory = await asyncio.gather(
+            get_account_choices(context), get_user_directory(context))
+        choices = Choices(accounts, label=lambda account: (
+            f"{account['title']} - "
+            f"{directory.username(account.get('owner'))}"))
+        if accounts:
+            cache.set(key, choices)
+    return choices
+
+
+async def get_currencies(context):
     """
     Fetch the list of currencies from the API.
 
-    Sends a GET request to the API to retrieve available currencies.
-    On success, returns a JSON response; on failure, logs an error and returns
-    an empty list.
+    Sends a GET request to the API to retrieve available currencies unless
+    they are already cached. On success, returns a JSON response; on failure,
+    logs an error and returns an empty list.
 
     Returns:
         list: A list of currency data, or an empty list if fetch fails.
     """
-    headers = {'Authorization': f'Token {context.user_data.get("api_token")}'}
-    response = requests.get(modules.constants.API_BASE_URL + "/currency/",
-                            headers=headers,
-                            verify=False)
-    if response.status_code == 200:
-        return response.json()
-    else:
-        logging.error(f"Failed to fetch currencies: {response.status_code}")
-        return []
+    return await fetch_reference(context, "/currency/", "currencies")
 
 
 async def ask_for_currency(update: Update,
@@ -104,10 +143,11 @@ async def ask_for_currency(update: Update,
     Returns:
         int: The next state, CURRENCY, in the conversation.
     """
-    currencies = get_currencies(context)
+    currencies = await get_currencies(context)
     keyboard = [
         [InlineKeyboardButton(currency['title'],
-                              callback_data=f"currency_{currency['id']}")]
+                              callback_data=encode('currency',
+                                                   currency['id']))]
         for currency in currencies
     ]
     reply_markup = InlineKeyboardMarkup(keyboard)
@@ -116,38 +156,154 @@ async def ask_for_currency(update: Update,
     return modules.constants.CURRENCY
 
 
-def get_categories(context):
+async def get_categories(context):
     """
     Fetch and return the list of categories from the API.
 
-    Logs an error if the fetch fails.
-    """
-    headers = {'Authorization': f'Token {context.user_data.get("api_token")}'}
-    response = requests.get(
-        modules.constants.API_BASE_URL + "/category/",
-        headers=headers,
-        verify=False)
-    if response.status_code == 200:
-        return response.json()
-    else:
-        logging.error(f"Failed to fetch categories: {response.status_code}")
-        return []
+    Serves the list from the reference data cache when possible and logs an
+    error if the fetch fails.
+    """
+    return (await get_category_choices(context)).items
 
 
-def post_transaction(data, context):
+async def get_category_choices(context):
     """
-    Post the transaction data to the API.
+    Return the categories for the category keyboard.
+
+    Returns:
+        Choices: The cached categories, with their keyboard pages and
+        search index.
+    """
+    return await fetch_reference(context, "/category/", "categories",
+                                 build=Choices)
+
+
+async def submit_transaction(client, token, data, idempotency_key=None):
+    """
+    Post a single transaction to the API on behalf of ``token``.
+
+    Unlike post_transaction, this function does not need a handler context,
+    so it can be used by background workers.
+
+    Args:
+        client (ApiClient): The shared API client.
+        token (str): API token of the user the transaction belongs to.
+        data (dict): Transaction data.
+        idempotency_key (str): Optional key sent in the Idempotency-Key
+            header, so a retried post is not stored twice.
+
+    Returns:
+        int or None: The response status code, or None if the request
+        could not be sent.
+    """
+    headers = None
+    if idempotency_key:
+        headers = {'Idempotency-Key': idempotency_key}
+    try:
+        response = await client.post(
+            "/transaction/", token, json=data, headers=headers)
+    except httpx.HTTPError as exc:
+        logging.error(f"Failed to post transaction: {exc!r}")
+        return None
+    if response.status_code != 201:
+        logging.error(f"Failed to post transaction: {response.status_code}")
+    return response.status_code
+
+
+async def _submit_bulk(client, token, items):
+    """
+    Post ``items`` to the bulk endpoint.
+
+    A batch rejected as a whole, e.g. with 400 or 422, means the API does
+    not accept the bulk format, so the bulk endpoint is not used again and
+    later batches are posted item by item straight away.
+
+    Returns:
+        list or None: The status of each item, or None if the API has no
+        bulk endpoint or rejected the batch as a whole.
+    """
+    body = [dict(data, idempotency_key=key) for key, data in items]
+    try:
+        response = await client.post(
+            modules.constants.BULK_TRANSACTION_PATH, token, json=body)
+    except httpx.HTTPError as exc:
+        logging.error(f"Failed to post transactions: {exc!r}")
+        return [None] * len(items)
+    if response.status_code in (404, 405, 501):
+        logging.info("The API has no bulk transaction endpoint")
+        client.features['bulk_transactions'] = False
+        return None
+    client.features['bulk_transactions'] = True
+    if response.status_code >= 500:
+        logging.error(f"Failed to post transactions: {response.status_code}")
+        return [response.status_code] * len(items)
+    if response.status_code not in (200, 201, 207):
+        logging.error(f"The API rejected a bulk transaction request: "
+                      f"{response.status_code}")
+        client.features['bulk_transactions'] = False
+        return None
+    try:
+        results = response.json()
+    except ValueError:
+        return [response.status_code] * len(items)
+    if not isinstance(results, list) or len(results) != len(items):
+        return [response.status_code] * len(items)
+    return [result.get('status', response.status_code)
+            for result in results]
 
-    Returns the success status of the operation.
+
+async def submit_transactions(client, token, items):
+    """
+    Post many transactions of one user to the API.
+
+    The transactions are sent in a single request to the bulk endpoint,
+    which answers with a list holding a ``status`` for every item. If the
+    API has no bulk endpoint, or rejects the batch as a whole, the
+    transactions are posted individually over concurrent requests instead.
+
+    Args:
+        client (ApiClient): The shared API client.
+        token (str): API token of the user the transactions belong to.
+        items (list): ``(idempotency_key, data)`` pairs.
+
+    Returns:
+        list: The status code of every item, in order, or None for items
+        that could not be sent.
     """
-    headers = {'Authorization': f'Token {context.user_data.get("api_token")}'}
-    response = requests.post(
-        modules.constants.API_BASE_URL + "/transaction/",
-        headers=headers, json=data, verify=False)
-    return response.status_code == 201
+    if not items:
+        return []
+    statuses = None
+    if len(items) > 1 and client.features.get('bulk_transactions', True):
+        statuses = await _submit_bulk(client, token, items)
+    if statuses is None:
+        statuses = await asyncio.gather(*(
+            submit_transaction(client, token, data, key)
+            for key, data in items))
+    return list(statuses)
+
 
+async def post_transaction(data, context):
+    """
+    Post the transaction data to the API.
 
-def get_user_details(context):
+    Returns the success status of the operation. A failed post drops the
+    cached reference data, since it may refer to categories, accounts or
+    currencies that no longer exist.
+    """
+    client = get_client(context)
+    status = await submit_transaction(
+        client, context.user_data.get("api_token"), data)
+    if status == 401:
+        token = await reauthenticate(context)
+        if token:
+            status = await submit_transaction(client, token, data)
+    if status != 201:
+        invalidate_reference_data(context)
+        return False
+    return True
+
+
+async def get_user_details(context):
     """
     Fetch the user's details from the API.
 
@@ -158,17 +314,10 @@ def get_user_details(context):
     Returns:
         dict: User details including the user ID.
     """
-    headers = {'Authorization': f'Token {context.user_data.get("api_token")}'}
-    response = requests.get(modules.constants.API_BASE_URL + "/users/me/",
-                            headers=headers,
-                            verify=False)
-    if response.status_code == 200:
-        return response.json()
-    else:
-        return None
+    return await fetch_json(context, "/users/me/", "user details", None)
 
 
-def get_family_status(context):
+async def get_family_status(context):
     """
     Fetch the family status from the API.
 
@@ -179,12 +328,4 @@ def get_family_status(context):
     Returns:
         list: A list of family status data.
     """
-    headers = {'Authorization': f'Token {context.user_data.get("api_token")}'}
-    response = requests.get(modules.constants.API_BASE_URL + "/family-state/",
-                            headers=headers,
-                            verify=False)
-    if response.status_code == 200:
-        return response.json()
-    else:
-        logging.error(f"Failed to fetch family status: {response.status_code}")
-        return []
+    return await fetch_json(context, "/family-state/", "family status", [])
@@ -7,36 +7,112 @@ to an authentication endpoint, passing the user's Telegram ID. On successful
 authentication, the function retrieves an API token which can be used for
 subsequent requests to the API.
 
+Tokens are kept in a store keyed by Telegram user ID that survives restarts
+of the bot, so the authentication endpoint is only asked once per user and
+token lifetime. Tokens rejected by the API are renewed on demand.
+
 The module is designed to be used in conjunction with the main script of the
 Telegram bot, where it assists in the process of managing user authentication
 for various bot functionalities. It separates the authentication logic from the
 main script, adhering to the principles of modularity and single
 responsibility.
 
+Classes:
+    TokenStore: API tokens keyed by Telegram user ID, with expiry.
+
 Functions:
-    authenticate_user(telegram_user_id, api_token, api_base_url): Authenticate
-    a user and retrieve an API token based on the given Telegram user ID.
+    request_token(client, telegram_user_id): Requests a new API token from
+    the authentication endpoint.
+    authenticate_user(telegram_user_id, context): Authenticate a user and
+    retrieve an API token based on the given Telegram user ID.
+    get_token_store(context): Returns the application-wide token store.
+    get_token(context, telegram_user_id): Returns the user's API token,
+    authenticating only if no valid token is known.
+    renew_token(client, store, telegram_user_id): Replaces a rejected token.
+    restore_credentials(update, context): Loads the stored token of the user
+    sending an update into the user's context.
 """
 import logging
+import time
 
-import requests
-import urllib3
+import httpx
+from telegram import Update
+from telegram.ext import CallbackContext
 
 import modules.constants
+from modules.client import get_client
 
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
+class TokenStore:
+    """
+    API tokens keyed by Telegram user ID.
 
-def authenticate_user(telegram_user_id):
+    Tokens are kept in memory and written to the bot's SQLite database, so
+    they survive restarts. A token older than the configured time-to-live
+    is treated as missing.
     """
-    Authenticate a user via their Telegram user ID and retrieve a token.
 
-    This function sends a POST request to the authentication endpoint of the
-    API, including the Telegram user ID in the payload. If authentication
-    succeeds, it returns the API token. In case of failure, logs an error
-    with the response status code and returns None.
+    def __init__(self, connection, ttl=None, timer=time.time):
+        """
+        Initialize the store and create its table if needed.
+
+        Args:
+            connection (sqlite3.Connection): Connection opened with
+                modules.storage.connect.
+            ttl (float): Seconds a token is used before a new one is
+                requested.
+            timer (callable): Wall clock used to age the tokens.
+        """
+        self.ttl = ttl or modules.constants.TOKEN_TTL
+        self._timer = timer
+        self._connection = connection
+        self._tokens = {}
+        with self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS tokens ("
+                " user_id INTEGER PRIMARY KEY,"
+                " token TEXT NOT NULL,"
+                " issued REAL NOT NULL)")
+
+    def get(self, telegram_user_id):
+        """Return the valid token of ``telegram_user_id``, or None."""
+        entry = self._tokens.get(telegram_user_id)
+        if entry is None:
+            row = self._connection.execute(
+                "SELECT token, issued FROM tokens WHERE user_id = ?",
+                (telegram_user_id,)).fetchone()
+            if row is None:
+                return None
+            entry = self._tokens[telegram_user_id] = (
+                row['token'], row['issued'])
+        token, issued = entry
+        if self._timer() - issued > self.ttl:
+            return None
+        return token
+
+    def set(self, telegram_user_id, token):
+        """Store ``token`` as the current token of ``telegram_user_id``."""
+        issued = self._timer()
+        self._tokens[telegram_user_id] = (token, issued)
+        with self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO tokens (user_id, token, issued)"
+                " VALUES (?, ?, ?)", (telegram_user_id, token, issued))
+
+    def delete(self, telegram_user_id):
+        """Forget the token of ``telegram_user_id``."""
+        self._tokens.pop(telegram_user_id, None)
+        with self._connection:
+            self._connection.execute(
+                "DELETE FROM tokens WHERE user_id = ?", (telegram_user_id,))
+
+
+async def request_token(client, telegram_user_id):
+    """
+    Request a new API token for ``telegram_user_id``.
 
     Args:
+        client (ApiClient): The shared API client.
         telegram_user_id (int): The Telegram user ID used for authentication.
 
     Returns:
@@ -44,14 +120,113 @@ def authenticate_user(telegram_user_id):
         None.
     """
     payload = {"telegram_userid": telegram_user_id}
-    headers = {'Authorization': f'Token {modules.constants.API_TOKEN}'}
-    response = requests.post(
-        f"{modules.constants.API_BASE_URL}/auth/telegram/",
-        headers=headers,
-        json=payload, verify=False)
+    try:
+        response = await client.post(
+            "/auth/telegram/", modules.constants.API_TOKEN, json=payload)
+    except httpx.HTTPError as exc:
+        logging.error(f"Authentication failed: {exc!r}")
+        return None
 
     if response.status_code == 200:
         return response.json().get('token')
     else:
         logging.error(f"Authentication failed: {response.status_code}")
         return None
+
+
+async def authenticate_user(telegram_user_id, context):
+    """
+    Authenticate a user via their Telegram user ID and retrieve a token.
+
+    This function sends a POST request to the authentication endpoint of the
+    API, including the Telegram user ID in the payload. If authentication
+    succeeds, it returns the API token. In case of failure, logs an error
+    with the response status code and returns None.
+
+    Args:
+        telegram_user_id (int): The Telegram user ID used for authentication.
+        context (CallbackContext): The context of the bot.
+
+    Returns:
+        str or None: The API token if authentication is successful, otherwise
+        None.
+    """
+    return await request_token(get_client(context), telegram_user_id)
+
+
+def get_token_store(context):
+    """
+    Return the application-wide token store.
+
+    Args:
+        context (CallbackContext): The context of the bot.
+
+    Returns:
+        TokenStore: The store kept in bot_data by the main script.
+    """
+    return context.bot_data['token_store']
+
+
+async def get_token(context, telegram_user_id):
+    """
+    Return the API token of the user, authenticating only when needed.
+
+    The token is looked up in the token store; the authentication endpoint
+    is only called if the store holds no valid token. The token is saved in
+    the user's context.
+
+    Args:
+        context (CallbackContext): The context of the bot.
+        telegram_user_id (int): The Telegram user ID of the user.
+
+    Returns:
+        str or None: The API token, or None if authentication failed.
+    """
+    context.user_data['telegram_user_id'] = telegram_user_id
+    store = get_token_store(context)
+    token = store.get(telegram_user_id)
+    if token is None:
+        token = await authenticate_user(telegram_user_id, context)
+        if token is None:
+            return None
+        store.set(telegram_user_id, token)
+    context.user_data['api_token'] = token
+    return token
+
+
+async def renew_token(client, store, telegram_user_id):
+    """
+    Replace the stored token of a user after the API rejected it.
+
+    Used as the ApiClient.reauthenticate hook.
+
+    Args:
+        client (ApiClient): The shared API client.
+        store (TokenStore): The token store.
+        telegram_user_id (int): The Telegram user ID of the user.
+
+    Returns:
+        str or None: The new API token, or None if authentication failed.
+    """
+    store.delete(telegram_user_id)
+    token = await request_token(client, telegram_user_id)
+    if token is not None:
+        store.set(telegram_user_id, token)
+    return token
+
+
+async def restore_credentials(update: Update, context: CallbackContext):
+    """
+    Load the stored token of the user sending ``update``.
+
+    Runs before the other handlers, so users do not have to send /start
+    again after the bot restarted. Does not contact the API.
+    """
+    user = update.effective_user
+    if user is None:
+        return
+    context.user_data['telegram_user_id'] = user.id
+    if 'api_token' not in context.user_data:
+        token = get_token_store(context).get(user.id)
+        if token is not None:
+            context.user_data['api_token'] = token
@@ -0,0 +1,167 @@
+"""
+Reference Data Cache Module for Telegram Bot.
+
+This module keeps rarely changing API data, such as categories, currencies
+and users, in memory so that the steps of the add-transaction conversation do
+not have to fetch the same lists from the API again and again. Entries expire
+after a configurable time-to-live, the cache is bounded in size with least
+recently used entries evicted first, and the data of a single token scope can
+be invalidated explicitly. Expired entries are kept until they are evicted,
+so their data can still be shown while the API is unavailable.
+
+The API returns the lists of the family the token owner belongs to, so the
+API token is used as the cache scope.
+
+Classes:
+    TTLCache: Size-bounded LRU cache with per-entry expiry.
+
+Functions:
+    get_reference_cache(context): Returns the application-wide cache.
+    fetch_reference(context, path, what, build): Returns cached reference
+    data, fetching it from the API on a miss.
+    invalidate_reference_data(context): Drops all cached data of the current
+    user's token scope.
+"""
+import logging
+import time
+from collections import OrderedDict
+
+from modules.client import fetch_json
+from modules.metrics import CACHE_REQUESTS
+
+
+class TTLCache:
+    """
+    Size-bounded least recently used cache with time-based expiry.
+
+    Keys are ``(scope, name)`` tuples, which allows dropping every entry of
+    one scope at once.
+    """
+
+    def __init__(self, maxsize, ttl, timer=time.monotonic, name=None):
+        """
+        Initialize the cache.
+
+        Args:
+            maxsize (int): Maximum number of entries kept in the cache.
+            ttl (float): Seconds an entry stays valid after it was stored.
+            timer (callable): Monotonic clock used to age the entries.
+            name (str): Name the hits and misses of the cache are recorded
+                under in the metrics; unnamed caches are not recorded.
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.name = name
+        self._timer = timer
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        """Return the number of stored entries, including expired ones."""
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        """
+        Return the value stored under ``key``.
+
+        Expired entries are reported as missing, but kept for get_stale.
+        """
+        entry = self._entries.get(key)
+        if entry is not None and self._timer() - entry[0] > self.ttl:
+            entry = None
+        if self.name is not None:
+            CACHE_REQUESTS.inc(self.name, 'miss' if entry is None else 'hit')
+        if entry is None:
+            return default
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def get_stale(self, key, default=None):
+        """Return the value stored under ``key`` even if it expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return default
+        return entry[1]
+
+    def set(self, key, value):
+        """Store ``value`` under ``key``, evicting the oldest entries."""
+        self._entries[key] = (self._timer(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        """Remove a single entry if it is present."""
+        self._entries.pop(key, None)
+
+    def invalidate_scope(self, scope):
+        """Remove every entry that belongs to ``scope``."""
+        for key in [key for key in self._entries if key[0] == scope]:
+            del self._entries[key]
+
+    def clear(self):
+        """Remove all entries."""
+        self._entries.clear()
+
+
+def get_reference_cache(context):
+    """
+    Return the application-wide reference data cache.
+
+    Args:
+        context (CallbackContext): The context of the bot.
+
+    Returns:
+        TTLCache: The cache stored in bot_data by the main script.
+    """
+    return context.bot_data['reference_cache']
+
+
+async def fetch_reference(context, path, what, build=list):
+    """
+    Return reference data for ``path``, using the cache when possible.
+
+    Failed fetches are not cached, so the next call tries the API again.
+    If a fetch fails, expired data of ``path`` is returned if there is any.
+    The fetched list is cached next to the built object; when the API
+    reports it unchanged, the object built before is used again.
+
+    Args:
+        context (CallbackContext): The context of the bot.
+        path (str): Endpoint path relative to the API base URL.
+        what (str): Human readable name of the data used in log messages.
+        build (callable): Turns the fetched list into the object that is
+            cached and returned, e.g. an index built once per scope.
+
+    Returns:
+        The object built from the data returned by the API, or built from
+        an empty list on failure.
+    """
+    cache = get_reference_cache(context)
+    key = (context.user_data.get("api_token"), path)
+    entry = cache.get(key)
+    if entry is None:
+        stale = cache.get_stale(key)
+        fetched = await fetch_json(context, path, what, None)
+        if fetched is None:
+            if stale is not None:
+                logging.warning(f"Using expired {what} while the API is "
+                                f"unavailable")
+                return stale[1]
+            return build([])
+        if stale is not None and stale[0] is fetched:
+            entry = stale
+        else:
+            entry = (fetched, build(fetched))
+        cache.set(key, entry)
+    return entry[1]
+
+
+def invalidate_reference_data(context):
+    """
+    Drop all cached reference data of the current user's token scope.
+
+    Args:
+        context (CallbackContext): The context of the bot.
+    """
+    get_reference_cache(context).invalidate_scope(
+        context.user_data.get("api_token"))
@@ -0,0 +1,267 @@
+"""
+Callback Data Module for Telegram Bot.
+
+This module encodes the data attached to inline keyboard buttons and routes
+button presses to their handlers. Telegram limits callback data to 64 bytes,
+and the bot used to send free-form strings like ``category_12`` that every
+handler split again and that were routed by one regular expression per
+registered handler.
+
+Callback data now consists of a schema version character, an action
+character and the integer arguments of the action, packed as varints and
+encoded with URL-safe base64. ``category_12`` becomes ``1cDA``. Decoding is
+memoized, and the action is routed with a single dictionary lookup. Callback
+data in the old format, e.g. on keyboards sent before an update of the bot,
+is still understood.
+
+Every action has exactly one owner: either a handler registered with the
+dispatcher or a handler elsewhere, e.g. in a conversation, that claimed it.
+Presses nobody accepts, like a button of a finished conversation, are
+answered by the dispatcher's fallback without contacting the API.
+
+Classes:
+    Callback: A decoded button press, holding the action and its arguments.
+    CallbackDispatcher: Routes button presses to handlers by action and
+    tracks the owner of every action.
+
+Functions:
+    encode(action, *args): Returns the callback data of a button.
+    decode(data): Returns the Callback encoded in callback data, or None.
+"""
+import base64
+import binascii
+import functools
+from typing import NamedTuple, Tuple
+
+VERSION = '1'
+
+# Action name: (code, number of arguments).
+ACTIONS = {
+    'add_transaction': ('T', 0),
+    'account_status': ('S', 0),
+    'family_status': ('F', 0),
+    'profile': ('P', 0),
+    'category': ('c', 1),
+    'who': ('w', 1),
+    'account': ('a', 1),
+    'currency': ('u', 1),
+    'calendar_day': ('d', 3),
+    'calendar_month': ('m', 2),
+    'category_page': ('C', 1),
+    'who_page': ('W', 1),
+    'account_page': ('A', 1),
+    'ignore': ('i', 0),
+}
+_ACTION_NAMES = {code: action for action, (code, _) in ACTIONS.items()}
+
+_LEGACY_COMMANDS = frozenset((
+    'add_transaction', 'account_status', 'family_status', 'profile',
+    'ignore'))
+_LEGACY_PREFIXES = {
+    'category': 'category',
+    'who': 'who',
+    'account': 'account',
+    'currency': 'currency',
+    'calendar-day': 'calendar_day',
+    'calendar-month': 'calendar_month',
+}
+
+
+class Callback(NamedTuple):
+    """A decoded button press."""
+
+    action: str
+    args: Tuple[int, ...] = ()
+
+
+def _pack(args):
+    """Pack non-negative integers as varints into URL-safe base64."""
+    packed = bytearray()
+    for arg in args:
+        value = int(arg)
+        if value < 0:
+            raise ValueError(f"Callback arguments must not be negative: "
+                             f"{arg!r}")
+        while value >= 0x80:
+            packed.append(value & 0x7f | 0x80)
+            value >>= 7
+        packed.append(value)
+    return base64.urlsafe_b64encode(bytes(packed)).rstrip(b'=').decode()
+
+
+def _unpack(text):
+    """Unpack the integers packed by _pack."""
+    packed = base64.b64decode(text + '=' * (-len(text) % 4), altchars=b'-_',
+                              validate=True)
+    args = []
+    value = shift = 0
+    for byte in packed:
+        value |= (byte & 0x7f) << shift
+        shift += 7
+        if not byte & 0x80:
+            args.append(value)
+            value = shift = 0
+    if shift:
+        raise ValueError("Truncated callback data")
+    return tuple(args)
+
+
+def encode(action, *args):
+    """
+    Return the callback data of a button.
+
+    Args:
+        action (str): One of the names in ACTIONS.
+        *args: Non-negative integers, e.g. the ID of the chosen item.
+
+    Returns:
+        str: The callback data.
+
+    Raises:
+        ValueError: If an argument is not a non-negative integer or the
+            number of arguments does not fit the action.
+    """
+    code, arity = ACTIONS[action]
+    if len(args) != arity:
+        raise ValueError(f"Callback action {action} takes {arity} "
+                         f"arguments, got {len(args)}")
+    return VERSION + code + _pack(args)
+
+
+def _decode_legacy(data):
+    """Decode callback data sent before the current schema, or None."""
+    if data in _LEGACY_COMMANDS:
+        return Callback(data)
+    separator = '-' if data.startswith('calendar-') else '_'
+    parts = data.split(separator)
+    for length in (2, 1):
+        action = _LEGACY_PREFIXES.get(separator.join(parts[:length]))
+        if action is not None:
+            try:
+                return Callback(action, tuple(map(int, parts[length:])))
+            except ValueError:
+                return None
+    return None
+
+
+def _checked(callback):
+    """Return ``callback`` if it has as many arguments as its action."""
+    if callback is None or len(callback.args) != ACTIONS[callback.action][1]:
+        return None
+    return callback
+
+
+@functools.lru_cache(maxsize=4096)
+def decode(data):
+    """
+    Return the Callback encoded in ``data``.
+
+    Args:
+        data (str): Callback data of a button press.
+
+    Returns:
+        Callback or None: The button press, or None if the data is malformed
+        or uses an unknown schema version.
+    """
+    if not isinstance(data, str):
+        return None
+    if data[:1] != VERSION:
+        return _checked(_decode_legacy(data))
+    action = _ACTION_NAMES.get(data[1:2])
+    if action is None:
+        return None
+    try:
+        return _checked(Callback(action, _unpack(data[2:])))
+    except (binascii.Error, ValueError):
+        return None
+
+
+class CallbackDispatcher:
+    """
+    Route button presses to handlers by action.
+
+    A single CallbackQueryHandler built from ``pattern`` and ``dispatch``
+    replaces one handler per action, so a press costs one decode and one
+    dictionary lookup however many actions are registered. It accepts every
+    press and must be added after the handlers that claimed actions, so
+    presses those handlers reject end up in the fallback.
+    """
+
+    def __init__(self, fallback):
+        """
+        Initialize a dispatcher without routes.
+
+        Args:
+            fallback (callable): Handler callback for presses of actions
+                without a route and of malformed callback data.
+        """
+        self.fallback = fallback
+        self._routes = {}
+        self._owners = {}
+
+    def _own(self, action, owner):
+        """
+        Record ``owner`` as the only owner of ``action``.
+
+        Raises:
+            ValueError: If ``action`` is unknown or already owned.
+        """
+        if action not in ACTIONS:
+            raise ValueError(f"Unknown callback action: {action}")
+        if action in self._owners:
+            raise ValueError(f"Callback action {action} is already owned "
+                             f"by {self._owners[action]}")
+        self._owners[action] = owner
+
+    def register(self, action, callback):
+        """
+        Route ``action`` to ``callback``.
+
+        Raises:
+            ValueError: If ``action`` is unknown or already owned.
+        """
+        self._own(action, callback.__name__)
+        self._routes[action] = callback
+
+    def claim(self, owner, *actions):
+        """
+        Hand ``actions`` to a handler outside the dispatcher.
+
+        Args:
+            owner (str): Name of the owner, used in error messages.
+            *actions (str): Names of the claimed actions.
+
+        Returns:
+            callable: A CallbackQueryHandler pattern accepting the actions.
+
+        Raises:
+            ValueError: If an action is unknown or already owned.
+        """
+        for action in actions:
+            self._own(action, owner)
+        accepted = frozenset(actions)
+
+        def pattern(data):
+            callback = decode(data)
+            return callback is not None and callback.action in accepted
+
+        return pattern
+
+    def unowned(self):
+        """Return the actions nobody handles, sorted by name."""
+        return sorted(set(ACTIONS) - set(self._owners))
+
+    def pattern(self, data):
+        """Accept every press; the dispatcher is the last resort."""
+        return True
+
+    def route(self, data):
+        """Return the handler callback for the callback data ``data``."""
+        callback = decode(data)
+        if callback is None:
+            return self.fallback
+        return self._routes.get(callback.action, self.fallback)
+
+    async def dispatch(self, update, context):
+        """Call the handler registered for the pressed button."""
+        return await self.route(update.callback_query.data)(update, context)
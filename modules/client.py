@@ -0,0 +1,416 @@
+"""
+HTTP Client Module for Telegram Bot.
+
+This module provides the asynchronous HTTP client used by the bot to talk to
+the family budget API. The client keeps a pool of keep-alive connections and
+applies configurable timeouts to every request, so a slow backend call only
+suspends the handler that issued it instead of blocking the whole event loop.
+
+A single client is created by the main script and stored in the application's
+bot_data, so every module talking to the API shares the same connection pool.
+Concurrent identical GET requests sent through fetch_json are coalesced into
+a single backend call. The duration and status of every request are recorded
+in modules.metrics, and as a span of the current trace of modules.tracing.
+When the API rejects a user's token, the user is re-authenticated
+transparently and the request is sent again.
+
+GET requests failing with a network error or a 502, 503 or 504 status are
+retried with a jittered backoff. After repeated failures a circuit breaker
+from modules.resilience rejects requests for a while with CircuitOpenError,
+an httpx.TransportError, so callers fall back to cached data at once.
+
+When the API sends an ETag or Last-Modified header with a list of
+categories, currencies, users or accounts, the validators and the decoded
+body are kept, and the next request for the same list is conditional. If
+the API answers 304 Not Modified, the body decoded before is returned
+without downloading or parsing it again.
+
+Classes:
+    ApiClient: Thin asynchronous wrapper around httpx.AsyncClient that adds
+    token authorization to requests sent to the API.
+    ValidatorCache: Validators and decoded bodies of GET responses, used for
+    conditional requests.
+
+Functions:
+    get_client(context): Returns the application-wide ApiClient instance.
+    reauthenticate(context): Replaces the rejected API token of the current
+    user with a new one.
+    fetch_json(context, path, what, default, params): Sends an authorized GET
+    request and returns the decoded JSON body.
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+
+import httpx
+
+import modules.constants
+from modules.metrics import (API_BYTES_SAVED, API_CIRCUIT_OPEN,
+                             API_NOT_MODIFIED, API_PARSE_SECONDS_SAVED,
+                             API_REQUEST_DURATION, API_REQUESTS_IN_FLIGHT,
+                             API_RESPONSES, API_RETRIES)
+from modules.resilience import CircuitBreaker, CircuitOpenError, backoff
+from modules.singleflight import SingleFlight
+from modules.tracing import span
+
+
+class ApiClient:
+    """
+    Asynchronous client for the family budget API.
+
+    All requests share one connection pool, so consecutive calls reuse
+    already established TCP/TLS connections.
+
+    Attributes:
+        single_flight (SingleFlight): Coalesces concurrent identical GETs.
+        features (dict): Optional API features detected at runtime, such
+            as support for bulk endpoints.
+        reauthenticate (callable): Coroutine function that takes a Telegram
+            user ID and returns a new API token for that user, or None. Set
+            by the main script; called when the API answers 401.
+        breaker (CircuitBreaker): Health of the API.
+        validators (ValidatorCache): Validators of earlier responses.
+    """
+
+    RETRY_STATUSES = (502, 503, 504)
+
+    def __init__(self, base_url, timeout=None, connect_timeout=None,
+                 max_connections=None, max_keepalive_connections=None,
+                 keepalive_expiry=None, retry_attempts=None,
+                 retry_delay=None, retry_max_delay=None,
+                 failure_threshold=None, reset_timeout=None):
+        """
+        Initialize the client.
+
+        The bot only talks to a single API host, so the pool limits below
+        are effectively per-host limits.
+
+        Args:
+            base_url (str): Base URL of the API.
+            timeout (float): Read/write/pool timeout in seconds.
+            connect_timeout (float): Connection timeout in seconds.
+            max_connections (int): Maximum number of concurrent connections.
+            max_keepalive_connections (int): Maximum number of idle
+                connections kept open for reuse.
+            keepalive_expiry (float): Seconds an idle connection is kept
+                alive.
+            retry_attempts (int): Attempts of a GET request, including the
+                first one.
+            retry_delay (float): Upper bound of the delay before the first
+                retry.
+            retry_max_delay (float): Upper bound of the retry delay.
+            failure_threshold (int): Consecutive failures opening the
+                circuit.
+            reset_timeout (float): Seconds before a request is tried again
+                while the circuit is open.
+        """
+        constants = modules.constants
+        if timeout is None:
+            timeout = constants.API_TIMEOUT
+        if connect_timeout is None:
+            connect_timeout = constants.API_CONNECT_TIMEOUT
+        if max_connections is None:
+            max_connections = constants.API_MAX_CONNECTIONS
+        if max_keepalive_connections is None:
+            max_keepalive_connections = (
+                constants.API_MAX_KEEPALIVE_CONNECTIONS)
+        if keepalive_expiry is None:
+            keepalive_expiry = constants.API_KEEPALIVE_EXPIRY
+        self.retry_attempts = retry_attempts or constants.API_RETRY_ATTEMPTS
+        self.retry_delay = retry_delay or constants.API_RETRY_DELAY
+        self.retry_max_delay = (retry_max_delay
+                                or constants.API_RETRY_MAX_DELAY)
+        self.breaker = CircuitBreaker(
+            failure_threshold or constants.API_CIRCUIT_FAILURE_THRESHOLD,
+            reset_timeout or constants.API_CIRCUIT_RESET_TIMEOUT)
+        self._client = httpx.AsyncClient(
+            base_url=base_url,
+            timeout=httpx.Timeout(timeout, connect=connect_timeout),
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry),
+            verify=False)
+        self.single_flight = SingleFlight()
+        self.features = {}
+        self.reauthenticate = None
+        self.validators = ValidatorCache(constants.API_VALIDATOR_CACHE_SIZE)
+
+    @staticmethod
+    def _headers(token):
+        """Build the authorization headers for the given API token."""
+        return {'Authorization': f'Token {token}'}
+
+    async def get(self, path, token, params=None, headers=None):
+        """
+        Send a GET request to the API.
+
+        Args:
+            path (str): Endpoint path relative to the base URL.
+            token (str): API token used for authorization.
+            params (dict): Optional query string parameters.
+            headers (dict): Optional extra request headers.
+
+        Returns:
+            httpx.Response: The response returned by the API.
+        """
+        request_headers = self._headers(token)
+        if headers:
+            request_headers.update(headers)
+        return await self._send(
+            'GET', path, headers=request_headers, params=params)
+
+    async def post(self, path, token, json=None, headers=None):
+        """
+        Send a POST request with a JSON body to the API.
+
+        Args:
+            path (str): Endpoint path relative to the base URL.
+            token (str): API token used for authorization.
+            json: JSON-serializable request body.
+            headers (dict): Optional extra request headers.
+
+        Returns:
+            httpx.Response: The response returned by the API.
+        """
+        request_headers = self._headers(token)
+        if headers:
+            request_headers.update(headers)
+        return await self._send(
+            'POST', path, headers=request_headers, json=json)
+
+    async def _send(self, method, path, **kwargs):
+        """
+        Send a request through the circuit breaker.
+
+        GET requests are retried after transient failures.
+
+        Raises:
+            CircuitOpenError: If the circuit is open.
+            httpx.HTTPError: If the last attempt failed without a response.
+        """
+        attempts = self.retry_attempts if method == 'GET' else 1
+        for attempt in range(1, attempts + 1):
+            if not self.breaker.allow():
+                API_RESPONSES.inc(method, path, 'circuit_open')
+                raise CircuitOpenError(
+                    f"Circuit open, not sending {method} {path}")
+            try:
+                response = await self._send_once(method, path, **kwargs)
+            except httpx.TransportError:
+                self._record(False)
+                if attempt == attempts:
+                    raise
+            else:
+                self._record(response.status_code < 500)
+                if (attempt == attempts
+                        or response.status_code not in self.RETRY_STATUSES):
+                    return response
+            API_RETRIES.inc(method, path)
+            await asyncio.sleep(backoff(
+                attempt, self.retry_delay, self.retry_max_delay))
+
+    def _record(self, success):
+        """Record the outcome of a request in the circuit breaker."""
+        if success:
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+        API_CIRCUIT_OPEN.set(int(self.breaker.state != 'closed'))
+
+    async def _send_once(self, method, path, **kwargs):
+        """Send a request and record it in the metrics and the trace."""
+        API_REQUESTS_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        status = 'error'
+        try:
+            with span(f"{method} {path}") as current:
+                response = await self._client.request(
+                    method, path, **kwargs)
+                if current is not None:
+                    current.attributes['http_status'] = response.status_code
+            status = str(response.status_code)
+            return response
+        finally:
+            API_REQUEST_DURATION.observe(
+                time.perf_counter() - started, method, path)
+            API_RESPONSES.inc(method, path, status)
+            API_REQUESTS_IN_FLIGHT.dec()
+
+    async def aclose(self):
+        """Close all pooled connections."""
+        await self._client.aclose()
+
+
+class ValidatorCache:
+    """
+    Validators and decoded bodies of GET responses.
+
+    Entries are keyed like the requests of fetch_json and evicted least
+    recently used first. Only the small reference lists in ``paths`` are
+    kept; large or changing data like the transaction history is not. The
+    decoded bodies are returned again for every 304 response, so callers
+    must not modify them, just like the results shared by SingleFlight.
+    """
+
+    PATHS = frozenset(('/category/', '/currency/', '/users/', '/account/'))
+
+    def __init__(self, maxsize, paths=PATHS):
+        """
+        Initialize the cache.
+
+        Args:
+            maxsize (int): Maximum number of responses kept.
+            paths (frozenset): Endpoint paths whose responses are kept.
+        """
+        self.maxsize = maxsize
+        self.paths = paths
+        self._entries = OrderedDict()
+
+    def headers(self, key):
+        """Return the conditional request headers for ``key``."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return {}
+        headers = {}
+        if entry['etag']:
+            headers['If-None-Match'] = entry['etag']
+        if entry['last_modified']:
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def decode(self, key, response):
+        """
+        Return the decoded body of a 200 response and keep its validators.
+
+        Responses of other paths than ``paths`` and responses without an
+        ETag or Last-Modified header are not kept.
+        """
+        started = time.perf_counter()
+        data = response.json()
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if key[0] in self.paths and (etag or last_modified):
+            self._entries[key] = {
+                'etag': etag, 'last_modified': last_modified, 'data': data,
+                'size': len(response.content),
+                'parse_time': time.perf_counter() - started}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        else:
+            self._entries.pop(key, None)
+        return data
+
+    def forget(self, key):
+        """Drop the validators and the body kept for ``key``."""
+        self._entries.pop(key, None)
+
+    def reuse(self, key, path):
+        """
+        Return the body kept for ``key`` after a 304 response, or None.
+
+        Records the bytes and the parse time saved in the metrics.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        API_NOT_MODIFIED.inc(path)
+        API_BYTES_SAVED.inc(path, amount=entry['size'])
+        API_PARSE_SECONDS_SAVED.inc(path, amount=entry['parse_time'])
+        return entry['data']
+
+
+def get_client(context):
+    """
+    Return the application-wide API client.
+
+    Args:
+        context (CallbackContext): The context of the bot.
+
+    Returns:
+        ApiClient: The client stored in bot_data by the main script.
+    """
+    return context.bot_data['api_client']
+
+
+async def reauthenticate(context):
+    """
+    Replace the rejected API token of the current user with a new one.
+
+    Concurrent re-authentications of the same user share one request.
+
+    Args:
+        context (CallbackContext): The context of the bot.
+
+    Returns:
+        str or None: The new token, or None if it cannot be obtained.
+    """
+    client = get_client(context)
+    user_id = context.user_data.get('telegram_user_id')
+    if client.reauthenticate is None or user_id is None:
+        return None
+    token = await client.single_flight.do(
+        ('auth', user_id), lambda: client.reauthenticate(user_id))
+    if token:
+        context.user_data['api_token'] = token
+    return token
+
+
+async def fetch_json(context, path, what, default, params=None):
+    """
+    Send an authorized GET request and return the decoded JSON body.
+
+    Concurrent calls for the same endpoint, parameters and token share one
+    request. A rejected token is renewed once before giving up. If the data
+    was fetched before with validators, the request is conditional and the
+    data decoded before is returned on 304; if that data was evicted in the
+    meantime, the request is repeated once without validators. Logs an
+    error and returns ``default`` if the request fails or the API responds
+    with another status than 200 or 304.
+
+    Args:
+        context (CallbackContext): The context of the bot.
+        path (str): Endpoint path relative to the base URL.
+        what (str): Human readable name of the data used in log messages.
+        default: Value returned when the data cannot be fetched.
+        params (dict): Optional query string parameters.
+    """
+    client = get_client(context)
+    token = context.user_data.get("api_token")
+    query = tuple(sorted(params.items())) if params else ()
+    key = (path, token, query)
+
+    async def fetch():
+        request_key = key
+        try:
+            response = await client.get(
+                path, token, params=params,
+                headers=client.validators.headers(request_key))
+            if response.status_code == 401:
+                new_token = await reauthenticate(context)
+                if new_token:
+                    request_key = (path, new_token, query)
+                    response = await client.get(
+                        path, new_token, params=params,
+                        headers=client.validators.headers(request_key))
+            if response.status_code == 304:
+                data = client.validators.reuse(request_key, path)
+                if data is not None:
+                    return data
+                # The data was evicted while the request was in flight.
+                client.validators.forget(request_key)
+                response = await client.get(
+                    path, request_key[1], params=params)
+        except httpx.HTTPError as exc:
+            logging.error(f"Failed to fetch {what}: {exc!r}")
+            return None
+        if response.status_code == 200:
+            return client.validators.decode(request_key, response)
+        logging.error(f"Failed to fetch {what}: {response.status_code}")
+        return None
+
+    data = await client.single_flight.do(key, fetch)
+    return default if data is None else data
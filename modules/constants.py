@@ -16,6 +16,70 @@ Constants:
     AMOUNT: Represents the state for inputting the transaction's amount.
     CURRENCY: Represents the state for selecting the transaction's currency.
     DATE: Represents the state for selecting the date of the transaction.
+    API_TIMEOUT: Timeout in seconds for reading an API response.
+    API_CONNECT_TIMEOUT: Timeout in seconds for connecting to the API.
+    API_MAX_CONNECTIONS: Maximum number of concurrent API connections.
+    API_MAX_KEEPALIVE_CONNECTIONS: Maximum number of idle API connections
+    kept open for reuse.
+    API_KEEPALIVE_EXPIRY: Seconds an idle API connection is kept alive.
+    API_RETRY_ATTEMPTS: Attempts of a GET request to the API, including the
+    first one.
+    API_RETRY_DELAY: Upper bound in seconds of the delay before the first
+    retry.
+    API_RETRY_MAX_DELAY: Upper bound in seconds of the retry delay.
+    API_CIRCUIT_FAILURE_THRESHOLD: Consecutive failed API requests after
+    which requests are rejected without being sent.
+    API_CIRCUIT_RESET_TIMEOUT: Seconds before a request is tried again
+    after the API failed repeatedly.
+    API_VALIDATOR_CACHE_SIZE: Maximum number of API responses kept for
+    conditional requests.
+    REFERENCE_CACHE_TTL: Seconds cached reference data stays valid.
+    REFERENCE_CACHE_SIZE: Maximum number of cached reference data lists.
+    STATUS_SCREEN_TIMEOUT: Seconds the status screens may spend waiting for
+    the API before giving up.
+    KEYBOARD_PAGE_SIZE: Number of items per page of the category, user and
+    account keyboards.
+    KEYBOARD_SEARCH_RESULTS: Maximum number of items shown for a search.
+    CATEGORY_SUGGESTIONS: Number of categories suggested for a title.
+    CATEGORY_MODEL_TTL: Seconds a family's category model is used before it
+    is rebuilt from the transaction history.
+    CATEGORY_MODEL_CACHE_SIZE: Maximum number of category models kept.
+    CALENDAR_LOCALE: Locale of the month and weekday names in the date
+    picker; English names are used if unset.
+    CALENDAR_FIRSTWEEKDAY: First day of the week in the date picker, 0 is
+    Monday and 6 is Sunday.
+    BULK_TRANSACTION_PATH: API endpoint accepting a list of transactions.
+    DATABASE_PATH: Path of the SQLite database with the bot's local state.
+    TOKEN_TTL: Seconds a stored API token is used before a new one is
+    requested.
+    PERSISTENCE_UPDATE_INTERVAL: Seconds between saves of the user data and
+    conversation states.
+    PERSISTENCE_WRITE_DELAY: Seconds changes are buffered before they are
+    written to the database.
+    PERSISTENCE_COMPACT_INTERVAL: Minimum seconds between compactions of
+    the database.
+    OUTBOX_BATCH_SIZE: Maximum number of transactions sent at once.
+    OUTBOX_RETRY_DELAY: Seconds before the first retry of a transaction.
+    OUTBOX_MAX_RETRY_DELAY: Upper bound of the retry delay in seconds.
+    OUTBOX_MAX_ATTEMPTS: Attempts after which a transaction is given up on.
+    OUTBOX_POLL_INTERVAL: Maximum seconds between checks of the outbox.
+    BOT_MODE: How updates are received, either "polling" or "webhook".
+    WEBHOOK_LISTEN: Address the embedded webhook server listens on.
+    WEBHOOK_PORT: Port the embedded webhook server listens on.
+    WEBHOOK_PATH: URL path the webhook server receives updates on.
+    WEBHOOK_URL: Public base URL Telegram sends the updates to.
+    WEBHOOK_SECRET: Secret token Telegram sends with every update; required
+    in webhook mode, since updates without it are not verified.
+    WEBHOOK_MAX_CONNECTIONS: Maximum number of simultaneous connections
+    Telegram opens to the webhook.
+    MAX_CONCURRENT_UPDATES: Maximum number of updates processed at the same
+    time; updates of one user are always processed in order.
+    METRICS_LISTEN: Address the metrics endpoint listens on; use 0.0.0.0
+    inside a container so Prometheus can reach it.
+    METRICS_PORT: Port of the metrics endpoint, e.g. 9464; 0, the default,
+    disables it.
+    TRACE_EXPORTER: Where the spans of add-transaction traces are written,
+    "stdout" or the path of a file; tracing is disabled if unset.
 """
 
 (TITLE, CATEGORY, WHO, ACCOUNT, AMOUNT, CURRENCY, DATE) = range(7)
@@ -23,3 +87,46 @@ Constants:
 API_BASE_URL = None
 API_TOKEN = None
 TELEGRAM_TOKEN = None
+API_TIMEOUT = 10.0
+API_CONNECT_TIMEOUT = 5.0
+API_MAX_CONNECTIONS = 20
+API_MAX_KEEPALIVE_CONNECTIONS = 10
+API_KEEPALIVE_EXPIRY = 30.0
+API_RETRY_ATTEMPTS = 3
+API_RETRY_DELAY = 0.2
+API_RETRY_MAX_DELAY = 2.0
+API_CIRCUIT_FAILURE_THRESHOLD = 5
+API_CIRCUIT_RESET_TIMEOUT = 30.0
+API_VALIDATOR_CACHE_SIZE = 1024
+REFERENCE_CACHE_TTL = 300.0
+REFERENCE_CACHE_SIZE = 1024
+STATUS_SCREEN_TIMEOUT = 8.0
+KEYBOARD_PAGE_SIZE = 8
+KEYBOARD_SEARCH_RESULTS = 8
+CATEGORY_SUGGESTIONS = 3
+CATEGORY_MODEL_TTL = 6 * 60 * 60.0
+CATEGORY_MODEL_CACHE_SIZE = 256
+CALENDAR_LOCALE = None
+CALENDAR_FIRSTWEEKDAY = 0
+BULK_TRANSACTION_PATH = '/transaction/bulk/'
+DATABASE_PATH = 'data/bot.sqlite3'
+TOKEN_TTL = 7 * 24 * 60 * 60.0
+PERSISTENCE_UPDATE_INTERVAL = 10.0
+PERSISTENCE_WRITE_DELAY = 1.0
+PERSISTENCE_COMPACT_INTERVAL = 60 * 60.0
+OUTBOX_BATCH_SIZE = 50
+OUTBOX_RETRY_DELAY = 2.0
+OUTBOX_MAX_RETRY_DELAY = 300.0
+OUTBOX_MAX_ATTEMPTS = 20
+OUTBOX_POLL_INTERVAL = 30.0
+BOT_MODE = 'polling'
+WEBHOOK_LISTEN = '0.0.0.0'
+WEBHOOK_PORT = 8443
+WEBHOOK_PATH = 'telegram'
+WEBHOOK_URL = None
+WEBHOOK_SECRET = None
+WEBHOOK_MAX_CONNECTIONS = 40
+MAX_CONCURRENT_UPDATES = 64
+METRICS_LISTEN = '127.0.0.1'
+METRICS_PORT = 0
+TRACE_EXPORTER = None
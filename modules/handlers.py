@@ -15,6 +15,10 @@ Functions:
     handle_account_selection(update, context): Manages account selection for
                                                the transaction and prompts for
                                                amount.
+    handle_page(update, context): Shows another page of the category, user
+                                  or account keyboard.
+    search_categories(update, context): Shows the categories matching the
+                                        text typed by the user.
     handle_calendar_callback(update, context): Manages user interaction with
                                                the inline calendar for date
                                                selection.
@@ -22,19 +26,32 @@ Functions:
 Each function ensures a smooth transition to the next transaction stage,
 providing a seamless user experience within the bot's conversation flow.
 """
+import asyncio
 import logging
+import time
 from datetime import datetime
 
-from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
+from telegram import Update
+from telegram.error import TelegramError
 from telegram.ext import CallbackContext, ConversationHandler
 
-from modules.api import (get_accounts, get_currencies, get_family_status,
-                         get_user_details, post_transaction)
+import modules.constants
+from modules.api import (get_account_keyboard, get_accounts,
+                         get_category_choices, get_currencies,
+                         get_family_status, get_user_details)
+from modules.cache import get_reference_cache
+from modules.callbacks import decode
 from modules.constants import ACCOUNT, AMOUNT, WHO
-from modules.user_management import get_users
+from modules.metrics import timed_handler
+from modules.outbox import get_outbox
+from modules.prediction import learn_transaction
+from modules.tracing import end_trace, traced
+from modules.user_management import get_user_directory
 from modules.utils import create_calendar
 
 
+@timed_handler
+@traced
 async def handle_category_selection(update: Update, context: CallbackContext):
     """
     Handle the user's selection of a transaction category.
@@ -44,23 +61,20 @@ async def handle_category_selection(update: Update, context: CallbackContext):
     query = update.callback_query
     await query.answer()
 
-    category_id = query.data.split("_")[1]
+    category_id = str(decode(query.data).args[0])
     context.user_data['transaction_data']['category'] = category_id
 
     await query.edit_message_text(text=f"Selected category ID: {category_id}\n"
                                   "Who is this transaction for?")
-    users = get_users(context)
-    keyboard = [
-        [InlineKeyboardButton(
-            user['username'], callback_data=f"who_{user['id']}")]
-        for user in users
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
+    directory = await get_user_directory(context)
     await query.message.reply_text(
-        "Choose a person:", reply_markup=reply_markup)
+        "Choose a person:",
+        reply_markup=directory.choices.page(0, 'who', 'who_page'))
     return WHO
 
 
+@timed_handler
+@traced
 async def handle_who_selection(update: Update, context: CallbackContext):
     """
     Handle the user's selection of who the transaction is for.
@@ -71,24 +85,72 @@ async def handle_who_selection(update: Update, context: CallbackContext):
     query = update.callback_query
     await query.answer()
 
-    who_id = query.data.split("_")[1]
+    who_id = str(decode(query.data).args[0])
     context.user_data['transaction_data']['who'] = who_id
 
     await query.edit_message_text("Select an account:")
-    accounts = get_accounts(context)
-    keyboard = []
-    for account in accounts:
-        account_display = f"{account['title']} - {account['username']}"
-        keyboard.append([InlineKeyboardButton(
-            account_display,
-            callback_data=f"account_{account['id']}")])
-
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    await query.message.reply_text("Choose an account:",
-                                   reply_markup=reply_markup)
+    choices = await get_account_keyboard(context)
+    await query.message.reply_text(
+        "Choose an account:",
+        reply_markup=choices.page(0, 'account', 'account_page'))
     return ACCOUNT
 
 
+async def _user_choices(context):
+    """Return the users of the family for the user keyboard."""
+    return (await get_user_directory(context)).choices
+
+
+# Page action: (loader of the Choices, action of the item buttons).
+_PAGES = {
+    'category_page': (get_category_choices, 'category'),
+    'who_page': (_user_choices, 'who'),
+    'account_page': (get_account_keyboard, 'account'),
+}
+
+
+@timed_handler
+@traced
+async def handle_page(update: Update, context: CallbackContext):
+    """
+    Show another page of the category, user or account keyboard.
+
+    The keyboards are cached with the reference data, so turning a page
+    usually needs no API request.
+    """
+    query = update.callback_query
+    await query.answer()
+
+    callback = decode(query.data)
+    load, action = _PAGES[callback.action]
+    choices = await load(context)
+    await query.edit_message_reply_markup(reply_markup=choices.page(
+        callback.args[0], action, callback.action))
+
+
+@timed_handler
+@traced
+async def search_categories(update: Update, context: CallbackContext):
+    """
+    Show the categories matching the text the user typed.
+
+    Keeps the conversation in the category step, so the user can pick one
+    of the matches or search again.
+    """
+    text = update.message.text
+    choices = await get_category_choices(context)
+    reply_markup = choices.search_markup(text, 'category')
+    if reply_markup is None:
+        await update.message.reply_text(
+            f"No category matches {text}. Try again or pick one from the "
+            "list.")
+        return
+    await update.message.reply_text("Matching categories:",
+                                    reply_markup=reply_markup)
+
+
+@timed_handler
+@traced
 async def handle_account_selection(update: Update, context: CallbackContext):
     """
     Handle the user's selection of an account for the transaction.
@@ -98,7 +160,7 @@ async def handle_account_selection(update: Update, context: CallbackContext):
     query = update.callback_query
     await query.answer()
 
-    account_id = query.data.split("_")[1]
+    account_id = str(decode(query.data).args[0])
     context.user_data['transaction_data']['account'] = account_id
 
     await query.edit_message_text(
@@ -107,6 +169,7 @@ async def handle_account_selection(update: Update, context: CallbackContext):
     return AMOUNT
 
 
+@timed_handler
 async def handle_account_status(update: Update, context: CallbackContext):
     """
     Fetch and display account status information to the user.
@@ -116,6 +179,12 @@ async def handle_account_status(update: Update, context: CallbackContext):
     formats this information into a readable format for the user. The function
     then sends this formatted account data back to the user.
 
+    If the status was shown before, the last balances are displayed at once,
+    marked with their age, and the message is edited in place when fresh
+    balances arrive from the background refresh. Otherwise the user details
+    and currencies are fetched concurrently, and all requests together must
+    finish within STATUS_SCREEN_TIMEOUT seconds.
+
     Args:
         update (Update): The Telegram update object containing message details.
         context (CallbackContext): Context object providing additional
@@ -125,37 +194,119 @@ async def handle_account_status(update: Update, context: CallbackContext):
     query = update.callback_query
     await query.answer()
 
-    user_details = get_user_details(context)
-    if not user_details:
-        await query.message.edit_text("Unable to fetch user details.")
+    cached = get_reference_cache(context).get_stale(
+        _account_status_key(context))
+    if cached is not None:
+        fetched_at, text = cached
+        await query.message.edit_text(
+            f"{text}\n\n(as of {_age(time.time() - fetched_at)}, "
+            f"updating...)")
+        context.application.create_task(
+            _refresh_account_status(query.message, context, cached),
+            update=update)
         return
 
-    currency_data = get_currencies(context)
+    text, _ = await _account_status_text(context)
+    await query.message.edit_text(text)
+
+
+async def _refresh_account_status(message, context: CallbackContext, cached):
+    """Replace the cached status shown in ``message`` with a fresh one."""
+    text, complete = await _account_status_text(context)
+    if not complete:
+        fetched_at, shown_text = cached
+        text = (f"{shown_text}\n\n(as of {_age(time.time() - fetched_at)}, "
+                f"could not be updated)")
+    try:
+        await message.edit_text(text)
+    except TelegramError as exc:
+        logging.error(f"Failed to update the account status: {exc!r}")
+
+
+def _account_status_key(context: CallbackContext):
+    """Return the reference cache key of the user's account status."""
+    return (context.user_data.get("api_token"), "account status")
+
+
+def _age(seconds):
+    """Return ``seconds`` as a rough age, e.g. "5 min ago"."""
+    if seconds < 60:
+        return "just now"
+    if seconds < 60 * 60:
+        return f"{int(seconds // 60)} min ago"
+    if seconds < 24 * 60 * 60:
+        return f"{int(seconds // (60 * 60))} h ago"
+    return f"{int(seconds // (24 * 60 * 60))} days ago"
+
+
+async def _account_status_text(context: CallbackContext):
+    """
+    Fetch the account status and return the text of the status screen.
+
+    A complete status is stored in the reference cache with the time it
+    was fetched at; failures are described in the returned text and not
+    stored.
+
+    Returns:
+        tuple: The text, and whether it shows the balances.
+    """
+    try:
+        user_details, currency_data, account_data = await asyncio.wait_for(
+            _load_account_status(context),
+            modules.constants.STATUS_SCREEN_TIMEOUT)
+    except asyncio.TimeoutError:
+        return ("Account status is not available right now, please try "
+                "again.", False)
+
+    if not user_details:
+        return "Unable to fetch user details.", False
+
     currency_map = {currency['id']: currency['code']
                     for currency in currency_data}
 
-    user_id = user_details['id']
-    account_data = get_accounts(context, user_id=user_id)
     if not account_data:
-        await query.message.edit_text("No account data available.")
-        return
+        return "No account data available.", False
 
     response_message = "\n".join([
         f"  {account['title']}: {account['balance']}"
         f" {currency_map.get(account['currency'], 'Unknown')}"
         for account in account_data
     ])
-    await query.message.edit_text("Account status:\n" + response_message)
+    text = "Account status:\n" + response_message
+    get_reference_cache(context).set(
+        _account_status_key(context), (time.time(), text))
+    return text, True
 
 
+async def _load_account_status(context: CallbackContext):
+    """
+    Fetch the data shown on the account status screen.
+
+    The user details and currencies do not depend on each other and are
+    requested concurrently; the accounts need the user ID and follow.
+
+    Returns:
+        tuple: User details, currencies and accounts of the user.
+    """
+    user_details, currency_data = await asyncio.gather(
+        get_user_details(context), get_currencies(context))
+    if not user_details:
+        return None, currency_data, []
+    account_data = await get_accounts(context, user_id=user_details['id'])
+    return user_details, currency_data, account_data
+
+
+@timed_handler
+@traced
 async def handle_calendar_callback(update: Update, context: CallbackContext):
     """
     Process the user's interaction with the inline calendar.
 
     Handles two types of interactions: selection of a specific date and
     navigation between months. For date selection, it stores the selected date
-    in the user's context and attempts to post the transaction. For month
-    navigation, it updates the calendar to display the selected month.
+    in the user's context and saves the transaction to the outbox, from which
+    it is delivered to the API in the background. For month navigation, it
+    updates the calendar to display the selected month.
 
     Args:
         update (Update): The incoming update.
@@ -166,36 +317,37 @@ async def handle_calendar_callback(update: Update, context: CallbackContext):
              maintains the current state for month navigation.
     """
     query = update.callback_query
-    callback_data = query.data
+    callback = decode(query.data)
     await query.answer()
 
-    parts = callback_data.split("-")
-
-    if parts[0] == "calendar" and parts[1] == "day" and len(parts) == 5:
-        year, month, day = map(int, parts[2:5])
+    if callback.action == 'calendar_day' and len(callback.args) == 3:
+        year, month, day = callback.args
         selected_date = datetime(year, month, day).date()
         context.user_data['transaction_data']['date'] = (
             selected_date.strftime("%Y-%m-%d"))
         data = context.user_data['transaction_data']
 
         if query.message:
-            if post_transaction(data, context):
-                await query.edit_message_text(
-                    text="Transaction successfully added.", reply_markup=None)
-            else:
-                await query.edit_message_text(
-                    text="Transaction failed to add.", reply_markup=None)
+            get_outbox(context).append(
+                data, context.user_data.get('api_token'),
+                user_id=update.effective_user.id,
+                chat_id=query.message.chat_id, trace=end_trace(context))
+            learn_transaction(context, data)
+            await query.edit_message_text(
+                text="Transaction saved. It will be sent to the budget"
+                     " shortly.", reply_markup=None)
         else:
             logging.error("No message associated with the callback query")
 
         return ConversationHandler.END
 
-    elif parts[0] == "calendar" and parts[1] == "month" and len(parts) == 4:
-        year, month = map(int, parts[2:4])
+    elif callback.action == 'calendar_month' and len(callback.args) == 2:
+        year, month = callback.args
         new_calendar = create_calendar(year, month)
         await query.edit_message_reply_markup(reply_markup=new_calendar)
 
 
+@timed_handler
 async def handle_profile(update: Update, context: CallbackContext):
     """
     Handle the 'Profile' button click in the Telegram bot.
@@ -206,6 +358,9 @@ async def handle_profile(update: Update, context: CallbackContext):
     of family members. The function replaces the message with the inline
     keyboard with this profile information.
 
+    The user details and the user list are fetched concurrently within
+    STATUS_SCREEN_TIMEOUT seconds.
+
     Args:
         update (Update): The Telegram update object containing message details.
         context (CallbackContext): Context object providing additional
@@ -215,15 +370,21 @@ async def handle_profile(update: Update, context: CallbackContext):
     query = update.callback_query
     await query.answer()
 
-    user_details = get_user_details(context)
+    try:
+        user_details, directory = await asyncio.wait_for(
+            asyncio.gather(get_user_details(context),
+                           get_user_directory(context)),
+            modules.constants.STATUS_SCREEN_TIMEOUT)
+    except asyncio.TimeoutError:
+        await query.message.edit_text(
+            "Profile is not available right now, please try again.")
+        return
+
     if not user_details:
         await query.message.reply_text("Unable to fetch user details.")
         return
 
-    all_users = get_users(context)
-    user_mapping = {user['id']: user['username'] for user in all_users}
-
-    family_members = [user_mapping.get(member_id, "Unknown")
+    family_members = [directory.username(member_id)
                       for member_id in user_details['family']['members']]
 
     response_message = (
@@ -241,6 +402,7 @@ async def handle_profile(update: Update, context: CallbackContext):
     await query.message.edit_text(response_message)
 
 
+@timed_handler
 async def handle_family_status(update: Update, context: CallbackContext):
     """
     Handle the 'Family Status' button click in the Telegram bot.
@@ -257,7 +419,7 @@ async def handle_family_status(update: Update, context: CallbackContext):
     query = update.callback_query
     await query.answer()
 
-    family_status = get_family_status(context)
+    family_status = await get_family_status(context)
     if not family_status:
         await query.message.edit_text("Unable to fetch family status.")
         return
@@ -0,0 +1,202 @@
+"""
+Keyboards Module for Telegram Bot.
+
+This module builds the inline keyboards users pick categories, users and
+accounts from. Long lists are split into pages with navigation buttons, so
+the markup stays within Telegram's limits however many categories a family
+has, and every page is built only once per list. The lists can also be
+searched: users type the first letters of a name and get the matching
+entries, with a fuzzy match as fallback for typos.
+
+Classes:
+    Choices: A list of items to pick from, with cached keyboard pages and a
+    prefix search index.
+"""
+import difflib
+from collections import defaultdict
+from operator import itemgetter
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+import modules.constants
+from modules.callbacks import encode
+
+
+class Choices:
+    """
+    A list of items to pick from.
+
+    Items are dictionaries with an ``id``. Instances are meant to be built
+    once per fetched list, e.g. as the ``build`` of fetch_reference, so the
+    pages and the search index are reused until the list is refreshed.
+
+    Attributes:
+        items (list): The items, in the order they are shown.
+    """
+
+    def __init__(self, items, label=itemgetter('title'), page_size=None):
+        """
+        Initialize the choices.
+
+        Args:
+            items (list): Items as returned by the API.
+            label (callable): Returns the button text of an item.
+            page_size (int): Buttons per page, KEYBOARD_PAGE_SIZE by default.
+        """
+        self.items = items
+        self.page_size = page_size or modules.constants.KEYBOARD_PAGE_SIZE
+        self._labels = [str(label(item)) for item in items]
+        self._pages = {}
+        self._index = None
+        self._positions = None
+
+    def __len__(self):
+        """Return the number of items."""
+        return len(self.items)
+
+    @property
+    def page_count(self):
+        """Return the number of pages, at least one."""
+        return max(1, -(-len(self.items) // self.page_size))
+
+    def page(self, number, action, page_action):
+        """
+        Return the keyboard of page ``number``.
+
+        Args:
+            number (int): Page number starting at 0; out of range numbers
+                are clamped.
+            action (str): Callback action of the item buttons, called with
+                the item ID.
+            page_action (str): Callback action of the navigation buttons,
+                called with the page number.
+
+        Returns:
+            InlineKeyboardMarkup: The page, built on first use.
+        """
+        number = min(max(number, 0), self.page_count - 1)
+        key = (number, action, page_action)
+        markup = self._pages.get(key)
+        if markup is None:
+            start = number * self.page_size
+            positions = range(start,
+                              min(start + self.page_size, len(self.items)))
+            rows = self._rows(positions, action)
+            if self.page_count > 1:
+                rows.append(self._navigation(number, page_action))
+            markup = self._pages[key] = InlineKeyboardMarkup(rows)
+        return markup
+
+    def _rows(self, positions, action):
+        """Return one button row per item position."""
+        return [[InlineKeyboardButton(
+            self._labels[position],
+            callback_data=encode(action, self.items[position]['id']))]
+            for position in positions]
+
+    def _navigation(self, number, page_action):
+        """Return the navigation row of page ``number``."""
+        row = []
+        if number > 0:
+            row.append(InlineKeyboardButton(
+                "<", callback_data=encode(page_action, number - 1)))
+        row.append(InlineKeyboardButton(
+            f"{number + 1}/{self.page_count}",
+            callback_data=encode('ignore')))
+        if number < self.page_count - 1:
+            row.append(InlineKeyboardButton(
+                ">", callback_data=encode(page_action, number + 1)))
+        return row
+
+    def suggestion_markup(self, ids, action, page_action):
+        """
+        Return a keyboard with the items ``ids`` and a button to page 0.
+
+        Args:
+            ids (list): IDs of the suggested items; unknown IDs are skipped.
+            action (str): Callback action of the item buttons.
+            page_action (str): Callback action of the button showing the
+                first page of the whole list.
+
+        Returns:
+            InlineKeyboardMarkup or None: The keyboard, or None if none of
+            the IDs is in the list.
+        """
+        if self._positions is None:
+            self._positions = {str(item['id']): position
+                               for position, item in enumerate(self.items)}
+        positions = [self._positions[str(item_id)] for item_id in ids
+                     if str(item_id) in self._positions]
+        if not positions:
+            return None
+        rows = self._rows(positions, action)
+        rows.append([InlineKeyboardButton(
+            "Other...", callback_data=encode(page_action, 0))])
+        return InlineKeyboardMarkup(rows)
+
+    def _build_index(self):
+        """Map every prefix of every word of the labels to positions."""
+        index = defaultdict(list)
+        for position, label in enumerate(self._labels):
+            prefixes = set()
+            for word in label.lower().split():
+                prefixes.update(word[:length]
+                                for length in range(1, len(word) + 1))
+            for prefix in prefixes:
+                index[prefix].append(position)
+        return index
+
+    def search_markup(self, text, action, limit=None):
+        """
+        Return a keyboard with the items matching ``text``.
+
+        Every word of ``text`` must be the beginning of a word of the
+        label. Labels starting with ``text`` come first. If nothing
+        matches, labels and words similar to ``text`` are shown.
+
+        Args:
+            text (str): What the user typed.
+            action (str): Callback action of the item buttons.
+            limit (int): Maximum number of buttons.
+
+        Returns:
+            InlineKeyboardMarkup or None: The keyboard, or None if nothing
+            matches.
+        """
+        positions = self._search(text, limit)
+        if not positions:
+            return None
+        return InlineKeyboardMarkup(self._rows(positions, action))
+
+    def _search(self, text, limit):
+        """Return the positions of the items matching ``text``."""
+        limit = limit or modules.constants.KEYBOARD_SEARCH_RESULTS
+        words = text.lower().split()
+        if not words:
+            return []
+        if self._index is None:
+            self._index = self._build_index()
+
+        matches = set(self._index.get(words[0], ()))
+        for word in words[1:]:
+            matches.intersection_update(self._index.get(word, ()))
+        if not matches:
+            return self._fuzzy(words, limit)
+        query = ' '.join(words)
+        return sorted(matches, key=lambda position: (
+            not self._labels[position].lower().startswith(query),
+            position))[:limit]
+
+    def _fuzzy(self, words, limit):
+        """Return positions of labels similar to ``words``."""
+        query = ' '.join(words)
+        labels = {}
+        for position, label in enumerate(self._labels):
+            labels.setdefault(label.lower(), position)
+            for word in label.lower().split():
+                labels.setdefault(word, position)
+        positions = []
+        for match in difflib.get_close_matches(query, labels, n=limit * 2):
+            if labels[match] not in positions:
+                positions.append(labels[match])
+        return positions[:limit]
@@ -0,0 +1,340 @@
+"""
+Metrics Module for Telegram Bot.
+
+This module collects counters, gauges and latency histograms of the bot and
+serves them on a local HTTP endpoint in the Prometheus text format, so the
+time spent in handlers and API calls can be watched in production. Metrics
+are plain in-memory numbers keyed by their label values; recording one is a
+dictionary update, and the text is only built when the endpoint is scraped.
+
+The metrics of the bot are defined here and recorded by the handlers, the
+API client and the caches.
+
+Classes:
+    Counter: Monotonically increasing value per label set.
+    Gauge: Value per label set that can go up and down, or that is read
+    from a function when scraped.
+    Histogram: Distribution of observed values in cumulative buckets.
+    Registry: The metrics served by the endpoint.
+
+Functions:
+    timed_handler(callback): Decorator recording the duration, errors and
+    concurrency of a handler callback.
+    start_metrics_server(host, port): Serves the registry on /metrics.
+"""
+import asyncio
+import bisect
+import functools
+import logging
+import math
+import time
+from collections import defaultdict
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+                   5.0, 10.0)
+
+
+def _escape(value):
+    """Escape a label value for the text format."""
+    return (str(value).replace('\\', r'\\').replace('\n', r'\n')
+            .replace('"', r'\"'))
+
+
+def _format_labels(names, values, extra=()):
+    """Return the ``{name="value",...}`` part of a sample line."""
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"'
+                          for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    """Return ``value`` in the text format."""
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class _Metric:
+    """Name, help text and label names shared by all metric types."""
+
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=()):
+        """
+        Initialize the metric.
+
+        Args:
+            name (str): Metric name, e.g. ``bot_api_responses_total``.
+            documentation (str): Help text shown by the endpoint.
+            labelnames (tuple): Names of the labels; values are passed
+                positionally in the same order when recording.
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def render(self):
+        """Return the lines of the metric in the text format."""
+        lines = [f"# HELP {self.name} {self.documentation}",
+                 f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self):
+        """Return the sample lines."""
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonically increasing value per label set."""
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        """Initialize the counter; see _Metric."""
+        super().__init__(name, documentation, labelnames)
+        self._values = defaultdict(float)
+
+    def inc(self, *labels, amount=1):
+        """Add ``amount`` to the value of ``labels``."""
+        self._values[labels] += amount
+
+    def _samples(self):
+        """Return the sample lines."""
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} "
+                f"{_format_value(value)}"
+                for labels, value in sorted(self._values.items())]
+
+
+class Gauge(Counter):
+    """
+    Value per label set that can go up and down.
+
+    A gauge created with ``function`` has no labels and reports the return
+    value of the function when scraped.
+    """
+
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), function=None):
+        """
+        Initialize the gauge; see _Metric.
+
+        Args:
+            function (callable): Optional function returning the current
+                value, called when the endpoint is scraped.
+        """
+        super().__init__(name, documentation, labelnames)
+        self.function = function
+
+    def dec(self, *labels, amount=1):
+        """Subtract ``amount`` from the value of ``labels``."""
+        self._values[labels] -= amount
+
+    def set(self, value, *labels):
+        """Set the value of ``labels``."""
+        self._values[labels] = value
+
+    def _samples(self):
+        """Return the sample lines."""
+        if self.function is not None:
+            return [f"{self.name} {_format_value(self.function())}"]
+        return super()._samples()
+
+
+class Histogram(_Metric):
+    """Distribution of observed values in cumulative buckets."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(),
+                 buckets=DEFAULT_BUCKETS):
+        """
+        Initialize the histogram; see _Metric.
+
+        Args:
+            buckets (tuple): Sorted upper bounds of the buckets; +Inf is
+                added automatically.
+        """
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets) + (math.inf,)
+        self._counts = {}
+        self._sums = defaultdict(float)
+
+    def observe(self, value, *labels):
+        """Record ``value`` for ``labels``."""
+        counts = self._counts.get(labels)
+        if counts is None:
+            counts = self._counts[labels] = [0] * len(self.buckets)
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        self._sums[labels] += value
+
+    def _samples(self):
+        """Return the sample lines."""
+        lines = []
+        for labels, counts in sorted(self._counts.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                bucket = _format_labels(self.labelnames, labels,
+                                        [('le', _format_value(bound))])
+                lines.append(f"{self.name}_bucket{bucket} {cumulative}")
+            names = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{names} "
+                         f"{_format_value(self._sums[labels])}")
+            lines.append(f"{self.name}_count{names} {cumulative}")
+        return lines
+
+
+class Registry:
+    """The metrics served by the endpoint."""
+
+    def __init__(self):
+        """Initialize an empty registry."""
+        self._metrics = {}
+
+    def register(self, metric):
+        """
+        Add ``metric`` and return it.
+
+        Raises:
+            ValueError: If a metric with the same name is registered.
+        """
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self):
+        """Return all metrics in the Prometheus text format."""
+        lines = []
+        for metric in self._metrics.values():
+            try:
+                lines.extend(metric.render())
+            except Exception as exc:
+                logging.error(f"Failed to collect metric {metric.name}: "
+                              f"{exc!r}")
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+HANDLER_DURATION = REGISTRY.register(Histogram(
+    'bot_handler_duration_seconds',
+    'Time spent in handler callbacks.', ('handler',)))
+HANDLER_ERRORS = REGISTRY.register(Counter(
+    'bot_handler_errors_total',
+    'Handler callbacks that raised an exception.', ('handler',)))
+HANDLERS_IN_PROGRESS = REGISTRY.register(Gauge(
+    'bot_handlers_in_progress',
+    'Handler callbacks currently running.', ('handler',)))
+API_REQUEST_DURATION = REGISTRY.register(Histogram(
+    'bot_api_request_duration_seconds',
+    'Time until the budget API responded.', ('method', 'path')))
+API_RESPONSES = REGISTRY.register(Counter(
+    'bot_api_responses_total',
+    'Responses of the budget API by status code; "error" counts requests '
+    'that failed without a response.', ('method', 'path', 'status')))
+API_REQUESTS_IN_FLIGHT = REGISTRY.register(Gauge(
+    'bot_api_requests_in_flight',
+    'Requests to the budget API waiting for a response.'))
+API_RETRIES = REGISTRY.register(Counter(
+    'bot_api_retries_total',
+    'Requests to the budget API retried after a transient failure.',
+    ('method', 'path')))
+API_NOT_MODIFIED = REGISTRY.register(Counter(
+    'bot_api_not_modified_total',
+    'Conditional requests the budget API answered with 304 Not Modified.',
+    ('path',)))
+API_BYTES_SAVED = REGISTRY.register(Counter(
+    'bot_api_bytes_saved_total',
+    'Response body bytes not downloaded thanks to 304 responses.',
+    ('path',)))
+API_PARSE_SECONDS_SAVED = REGISTRY.register(Counter(
+    'bot_api_parse_seconds_saved_total',
+    'Time not spent decoding response bodies thanks to 304 responses.',
+    ('path',)))
+API_CIRCUIT_OPEN = REGISTRY.register(Gauge(
+    'bot_api_circuit_open',
+    'Whether requests to the budget API are being rejected, 1 if so.'))
+CACHE_REQUESTS = REGISTRY.register(Counter(
+    'bot_cache_requests_total',
+    'Cache lookups by cache and result, "hit" or "miss".',
+    ('cache', 'result')))
+OUTBOX_PENDING = REGISTRY.register(Gauge(
+    'bot_outbox_pending',
+    'Transactions waiting in the outbox to be delivered.'))
+
+
+def timed_handler(callback):
+    """
+    Record the duration, errors and concurrency of a handler callback.
+
+    Args:
+        callback (callable): Coroutine function taking update and context.
+
+    Returns:
+        callable: The wrapped callback, with the same name.
+    """
+    name = callback.__name__
+
+    @functools.wraps(callback)
+    async def wrapper(update, context):
+        HANDLERS_IN_PROGRESS.inc(name)
+        started = time.perf_counter()
+        try:
+            return await callback(update, context)
+        except Exception:
+            HANDLER_ERRORS.inc(name)
+            raise
+        finally:
+            HANDLER_DURATION.observe(time.perf_counter() - started, name)
+            HANDLERS_IN_PROGRESS.dec(name)
+
+    return wrapper
+
+
+async def _serve(reader, writer, registry):
+    """Answer one HTTP request of the metrics endpoint."""
+    try:
+        request_line = await asyncio.wait_for(reader.readline(), 5)
+        while (await asyncio.wait_for(reader.readline(), 5)).strip():
+            pass
+        parts = request_line.decode('latin-1').split()
+        if len(parts) >= 2 and parts[0] == 'GET' and (
+                parts[1].split('?')[0] == '/metrics'):
+            status = '200 OK'
+            body = registry.render().encode()
+        else:
+            status = '404 Not Found'
+            body = b'Not found\n'
+        writer.write(
+            f"HTTP/1.1 {status}\r\n"
+            f"Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: close\r\n\r\n".encode() + body)
+        await writer.drain()
+    except (asyncio.TimeoutError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def start_metrics_server(host, port, registry=REGISTRY):
+    """
+    Serve ``registry`` on http://host:port/metrics.
+
+    Args:
+        host (str): Address to listen on.
+        port (int): Port to listen on.
+        registry (Registry): The metrics to serve.
+
+    Returns:
+        asyncio.AbstractServer: The server; close it on shutdown.
+    """
+    return await asyncio.start_server(
+        functools.partial(_serve, registry=registry), host, port)
@@ -0,0 +1,286 @@
+"""
+Transaction Outbox Module for Telegram Bot.
+
+This module stores confirmed transactions in a local SQLite outbox before
+they are sent to the API. Appending to the outbox takes well under a
+millisecond, so the bot can acknowledge a transaction immediately, while a
+background worker delivers the stored transactions in bulk requests, one per
+user, and retries them with exponential backoff if the API is slow or
+unavailable. Rejected tokens are renewed before the next attempt. Every
+transaction carries an idempotency key, so a retried delivery is not stored
+twice by the API.
+
+Classes:
+    Outbox: Durable queue of transactions waiting to be sent to the API.
+
+Functions:
+    get_outbox(context): Returns the application-wide outbox.
+"""
+import asyncio
+import json
+import logging
+import random
+import time
+import uuid
+
+import modules.constants
+from modules.api import submit_transactions
+from modules.tracing import record_delivery
+
+SENT_STATUSES = (200, 201, 409)
+RETRY_STATUSES = (None, 401, 408, 429)
+
+
+class Outbox:
+    """
+    Durable queue of transactions waiting to be sent to the API.
+
+    Entries are removed once the API accepted them. Entries the API rejects,
+    or that still fail after the maximum number of attempts, are kept with
+    the ``failed`` status for inspection.
+    """
+
+    def __init__(self, connection, batch_size=None, retry_delay=None,
+                 max_retry_delay=None, max_attempts=None,
+                 poll_interval=None, timer=time.time):
+        """
+        Initialize the outbox and create its table if needed.
+
+        Args:
+            connection (sqlite3.Connection): Connection opened with
+                modules.storage.connect.
+            batch_size (int): Maximum number of transactions sent at once.
+            retry_delay (float): Delay in seconds before the first retry.
+            max_retry_delay (float): Upper bound of the retry delay.
+            max_attempts (int): Attempts after which a transaction is
+                marked as failed.
+            poll_interval (float): Maximum seconds the worker sleeps
+                between checks of the outbox.
+            timer (callable): Wall clock used to schedule retries.
+        """
+        constants = modules.constants
+        self.batch_size = batch_size or constants.OUTBOX_BATCH_SIZE
+        self.retry_delay = retry_delay or constants.OUTBOX_RETRY_DELAY
+        self.max_retry_delay = (max_retry_delay
+                                or constants.OUTBOX_MAX_RETRY_DELAY)
+        self.max_attempts = max_attempts or constants.OUTBOX_MAX_ATTEMPTS
+        self.poll_interval = (poll_interval
+                              or constants.OUTBOX_POLL_INTERVAL)
+        self._timer = timer
+        self._connection = connection
+        self._wakeup = None
+        self._task = None
+        with self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS outbox ("
+                " key TEXT PRIMARY KEY,"
+                " token TEXT,"
+                " user_id INTEGER,"
+                " chat_id INTEGER,"
+                " payload TEXT NOT NULL,"
+                " status TEXT NOT NULL DEFAULT 'pending',"
+                " attempts INTEGER NOT NULL DEFAULT 0,"
+                " next_attempt REAL NOT NULL,"
+                " created REAL NOT NULL,"
+                " trace TEXT)")
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS outbox_due"
+                " ON outbox (status, next_attempt)")
+
+    def append(self, data, token, user_id=None, chat_id=None, trace=None):
+        """
+        Store a transaction for delivery and wake up the worker.
+
+        Args:
+            data (dict): Transaction data.
+            token (str): API token of the user the transaction belongs to.
+            user_id (int): Telegram user ID of the user.
+            chat_id (int): Chat to notify if the delivery fails.
+            trace (dict): Trace of the transaction from
+                modules.tracing.end_trace, to record the delivery in.
+
+        Returns:
+            str: The idempotency key of the stored transaction.
+        """
+        key = uuid.uuid4().hex
+        now = self._timer()
+        with self._connection:
+            self._connection.execute(
+                "INSERT INTO outbox (key, token, user_id, chat_id, payload,"
+                " next_attempt, created, trace)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, token, user_id, chat_id, json.dumps(data), now, now,
+                 json.dumps(trace) if trace else None))
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return key
+
+    def pending_count(self):
+        """Return the number of transactions waiting for delivery."""
+        return self._connection.execute(
+            "SELECT COUNT(*) FROM outbox WHERE status = 'pending'"
+        ).fetchone()[0]
+
+    def _due(self):
+        """Return the entries whose next delivery attempt is due."""
+        rows = self._connection.execute(
+            "SELECT * FROM outbox WHERE status = 'pending'"
+            " AND next_attempt <= ? ORDER BY next_attempt LIMIT ?",
+            (self._timer(), self.batch_size)).fetchall()
+        return [dict(row, payload=json.loads(row['payload']),
+                     trace=json.loads(row['trace'] or 'null'))
+                for row in rows]
+
+    def _next_due_in(self):
+        """Return seconds until the next retry is due, or None."""
+        row = self._connection.execute(
+            "SELECT MIN(next_attempt) FROM outbox WHERE status = 'pending'"
+        ).fetchone()
+        if row[0] is None:
+            return None
+        return max(0.0, row[0] - self._timer())
+
+    def _retry_delay(self, attempts):
+        """Return the jittered exponential backoff for ``attempts``."""
+        delay = min(self.max_retry_delay,
+                    self.retry_delay * 2 ** (attempts - 1))
+        return delay * random.uniform(0.5, 1.5)
+
+    async def flush(self, client, on_failure=None, on_success=None):
+        """
+        Send one batch of due transactions to the API.
+
+        Args:
+            client (ApiClient): The shared API client.
+            on_failure (callable): Coroutine function called with the entry
+                and the last response status when a transaction is given
+                up on.
+            on_success (callable): Coroutine function called with the entry
+                and the response status when the API stored a transaction.
+
+        Returns:
+            int: The number of entries that were processed.
+        """
+        entries = self._due()
+        if not entries:
+            return 0
+        by_token = {}
+        for entry in entries:
+            by_token.setdefault(entry['token'], []).append(entry)
+        results = await asyncio.gather(*(
+            submit_transactions(
+                client, token,
+                [(entry['key'], entry['payload']) for entry in group])
+            for token, group in by_token.items()))
+        entries = [entry for group in by_token.values() for entry in group]
+        statuses = [status for group in results for status in group]
+        await self._renew_tokens(client, [
+            entry for entry, status in zip(entries, statuses)
+            if status == 401])
+
+        sent, failed = [], []
+        with self._connection:
+            for entry, status in zip(entries, statuses):
+                attempts = entry['attempts'] + 1
+                if status in SENT_STATUSES:
+                    self._connection.execute(
+                        "DELETE FROM outbox WHERE key = ?", (entry['key'],))
+                    record_delivery(entry['trace'], entry['created'], status,
+                                    attempts, committed=True)
+                    sent.append((entry, status))
+                elif ((status in RETRY_STATUSES or status >= 500)
+                      and attempts < self.max_attempts):
+                    self._connection.execute(
+                        "UPDATE outbox SET attempts = ?, next_attempt = ?"
+                        " WHERE key = ?",
+                        (attempts, self._timer() + self._retry_delay(attempts),
+                         entry['key']))
+                else:
+                    self._connection.execute(
+                        "UPDATE outbox SET attempts = ?, status = 'failed'"
+                        " WHERE key = ?", (attempts, entry['key']))
+                    record_delivery(entry['trace'], entry['created'], status,
+                                    attempts, committed=False)
+                    failed.append((entry, status))
+
+        if on_success is not None:
+            for entry, status in sent:
+                await on_success(entry, status)
+        for entry, status in failed:
+            logging.error(f"Giving up on transaction {entry['key']}: "
+                          f"{status}")
+            if on_failure is not None:
+                await on_failure(entry, status)
+        return len(entries)
+
+    async def _renew_tokens(self, client, entries):
+        """Request new tokens for entries whose token was rejected."""
+        if client.reauthenticate is None:
+            return
+        user_ids = {entry['user_id'] for entry in entries
+                    if entry['user_id'] is not None}
+        for user_id in user_ids:
+            token = await client.single_flight.do(
+                ('auth', user_id), lambda: client.reauthenticate(user_id))
+            if token:
+                with self._connection:
+                    self._connection.execute(
+                        "UPDATE outbox SET token = ? WHERE user_id = ?"
+                        " AND status = 'pending'", (token, user_id))
+
+    async def run(self, client, on_failure=None, on_success=None):
+        """
+        Deliver transactions until the worker is cancelled.
+
+        Args:
+            client (ApiClient): The shared API client.
+            on_failure (callable): See flush.
+            on_success (callable): See flush.
+        """
+        self._wakeup = asyncio.Event()
+        while True:
+            try:
+                processed = await self.flush(client, on_failure,
+                                             on_success)
+            except Exception as exc:
+                logging.error(f"Failed to flush the outbox: {exc!r}")
+                processed = 0
+            if processed == self.batch_size:
+                continue
+            timeout = self._next_due_in()
+            if timeout is None or timeout > self.poll_interval:
+                timeout = self.poll_interval
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    def start(self, client, on_failure=None, on_success=None):
+        """Start the background delivery worker."""
+        self._task = asyncio.create_task(
+            self.run(client, on_failure, on_success))
+
+    async def stop(self):
+        """Stop the background delivery worker."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+
+def get_outbox(context):
+    """
+    Return the application-wide transaction outbox.
+
+    Args:
+        context (CallbackContext): The context of the bot.
+
+    Returns:
+        Outbox: The outbox stored in bot_data by the main script.
+    """
+    return context.bot_data['outbox']
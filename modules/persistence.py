@@ -0,0 +1,197 @@
+"""
+Persistence Module for Telegram Bot.
+
+This module stores the bot's user data and conversation states in the bot's
+SQLite database, so transactions that are being added survive a restart or
+redeploy of the bot. Each user and each conversation is a single row that is
+replaced when it changes, instead of dumping the whole state into one file.
+Changes are buffered and written in one database transaction shortly after
+they were reported, and the write-ahead log is checkpointed periodically to
+keep the database compact.
+
+Only user data and conversation states are persisted. The bot data holds
+the shared API client, caches and the outbox and is rebuilt on start.
+
+Classes:
+    SQLitePersistence: BasePersistence implementation backed by SQLite.
+"""
+import asyncio
+import json
+import logging
+import time
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+import modules.constants
+
+
+class SQLitePersistence(BasePersistence):
+    """
+    Persist user data and conversation states in SQLite.
+
+    Writes are buffered for ``write_delay`` seconds, so all changes reported
+    by one persistence run of the application end up in a single database
+    transaction.
+    """
+
+    def __init__(self, connection, update_interval=None, write_delay=None,
+                 compact_interval=None):
+        """
+        Initialize the persistence and create its tables if needed.
+
+        Args:
+            connection (sqlite3.Connection): Connection opened with
+                modules.storage.connect.
+            update_interval (float): Seconds between the application's
+                persistence runs.
+            write_delay (float): Seconds changes are buffered before they
+                are written.
+            compact_interval (float): Minimum seconds between checkpoints
+                of the write-ahead log.
+        """
+        constants = modules.constants
+        super().__init__(
+            store_data=PersistenceInput(
+                bot_data=False, chat_data=False, user_data=True,
+                callback_data=False),
+            update_interval=(update_interval
+                             or constants.PERSISTENCE_UPDATE_INTERVAL))
+        self.write_delay = write_delay or constants.PERSISTENCE_WRITE_DELAY
+        self.compact_interval = (compact_interval
+                                 or constants.PERSISTENCE_COMPACT_INTERVAL)
+        self._connection = connection
+        self._pending_users = {}
+        self._pending_conversations = {}
+        self._write_handle = None
+        self._last_compaction = time.monotonic()
+        with self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS user_data ("
+                " user_id INTEGER PRIMARY KEY,"
+                " data TEXT NOT NULL)")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS conversations ("
+                " name TEXT NOT NULL,"
+                " key TEXT NOT NULL,"
+                " state TEXT NOT NULL,"
+                " PRIMARY KEY (name, key))")
+
+    async def get_user_data(self):
+        """Return the stored user data of all users."""
+        rows = self._connection.execute(
+            "SELECT user_id, data FROM user_data").fetchall()
+        return {row['user_id']: json.loads(row['data']) for row in rows}
+
+    async def get_chat_data(self):
+        """Return an empty mapping, chat data is not persisted."""
+        return {}
+
+    async def get_bot_data(self):
+        """Return an empty mapping, bot data is not persisted."""
+        return {}
+
+    async def get_callback_data(self):
+        """Return None, callback data is not persisted."""
+        return None
+
+    async def get_conversations(self, name):
+        """Return the stored states of the conversation handler ``name``."""
+        rows = self._connection.execute(
+            "SELECT key, state FROM conversations WHERE name = ?",
+            (name,)).fetchall()
+        return {tuple(json.loads(row['key'])): json.loads(row['state'])
+                for row in rows}
+
+    async def update_user_data(self, user_id, data):
+        """Buffer the new user data of ``user_id``."""
+        self._pending_users[user_id] = data
+        self._schedule_write()
+
+    async def update_conversation(self, name, key, new_state):
+        """Buffer the new state of a conversation; None ends it."""
+        self._pending_conversations[name, json.dumps(list(key))] = new_state
+        self._schedule_write()
+
+    async def drop_user_data(self, user_id):
+        """Delete the stored user data of ``user_id``."""
+        self._pending_users[user_id] = None
+        self._schedule_write()
+
+    async def update_chat_data(self, chat_id, data):
+        """Ignore chat data, which is not persisted."""
+
+    async def update_bot_data(self, data):
+        """Ignore bot data, which is not persisted."""
+
+    async def update_callback_data(self, data):
+        """Ignore callback data, which is not persisted."""
+
+    async def drop_chat_data(self, chat_id):
+        """Ignore chat data, which is not persisted."""
+
+    async def refresh_user_data(self, user_id, user_data):
+        """Do nothing, user data is only changed by this bot."""
+
+    async def refresh_chat_data(self, chat_id, chat_data):
+        """Ignore chat data, which is not persisted."""
+
+    async def refresh_bot_data(self, bot_data):
+        """Ignore bot data, which is not persisted."""
+
+    async def flush(self):
+        """Write all buffered changes and compact the database."""
+        self._write_pending()
+        self.compact()
+
+    def _schedule_write(self):
+        """Write the buffered changes after ``write_delay`` seconds."""
+        if self._write_handle is None:
+            self._write_handle = asyncio.get_running_loop().call_later(
+                self.write_delay, self._write_pending)
+
+    def _write_pending(self):
+        """Write all buffered changes in one transaction."""
+        if self._write_handle is not None:
+            self._write_handle.cancel()
+            self._write_handle = None
+        users, self._pending_users = self._pending_users, {}
+        conversations, self._pending_conversations = (
+            self._pending_conversations, {})
+        if not users and not conversations:
+            return
+
+        upserts = []
+        for user_id, data in users.items():
+            if data is None:
+                continue
+            try:
+                upserts.append((user_id, json.dumps(data)))
+            except (TypeError, ValueError) as exc:
+                logging.error(f"Cannot persist data of user {user_id}: "
+                              f"{exc!r}")
+        with self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO user_data (user_id, data)"
+                " VALUES (?, ?)", upserts)
+            self._connection.executemany(
+                "DELETE FROM user_data WHERE user_id = ?",
+                [(user_id,) for user_id, data in users.items()
+                 if data is None])
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO conversations (name, key, state)"
+                " VALUES (?, ?, ?)",
+                [(name, key, json.dumps(state))
+                 for (name, key), state in conversations.items()
+                 if state is not None])
+            self._connection.executemany(
+                "DELETE FROM conversations WHERE name = ? AND key = ?",
+                [(name, key) for (name, key), state in conversations.items()
+                 if state is None])
+
+        if time.monotonic() - self._last_compaction > self.compact_interval:
+            self.compact()
+
+    def compact(self):
+        """Move the write-ahead log into the database and truncate it."""
+        self._last_compaction = time.monotonic()
+        self._connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
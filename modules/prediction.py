@@ -0,0 +1,166 @@
+"""
+Category Prediction Module for Telegram Bot.
+
+This module suggests categories for a transaction title, so users usually
+pick the category with one tap instead of paging through the whole list.
+For every family the bot keeps an index from the words of transaction
+titles to how often each category was chosen for them. The index is built
+from the family's transaction history once and then updated with every
+transaction added through the bot.
+
+Classes:
+    CategoryModel: Word to category frequency index of one family.
+
+Functions:
+    tokenize(title): Returns the words of a title used for prediction.
+    get_category_models(context): Returns the application-wide model cache.
+    get_category_model(context): Returns the model of the current user's
+    family, loading the history on first use.
+    get_cached_category_model(context): Returns the model of the current
+    user's family if it is loaded, without contacting the API.
+    learn_transaction(context, data): Updates the model with a transaction
+    added by the user.
+"""
+import re
+from collections import Counter, defaultdict
+
+from modules.client import fetch_json
+
+_WORD = re.compile(r"\w{2,}")
+
+
+def tokenize(title):
+    """Return the lowercase words of ``title`` with at least two letters."""
+    return _WORD.findall(str(title).lower())
+
+
+class CategoryModel:
+    """
+    Word to category frequency index of one family.
+
+    A category scores for every word of the title, weighted by the share of
+    the word's transactions that used the category, so frequent words like
+    "payment" count less than distinctive ones.
+    """
+
+    def __init__(self, transactions=()):
+        """
+        Build the model from past transactions.
+
+        Args:
+            transactions (list or dict): Transactions as returned by the
+                API, either a list or a paginated response with a
+                ``results`` list.
+        """
+        self._words = defaultdict(Counter)
+        self._totals = Counter()
+        if isinstance(transactions, dict):
+            transactions = transactions.get('results') or []
+        for transaction in transactions:
+            if isinstance(transaction, dict):
+                self.learn(transaction.get('title'),
+                           transaction.get('category'))
+
+    def __len__(self):
+        """Return the number of known words."""
+        return len(self._words)
+
+    def learn(self, title, category_id):
+        """Count ``category_id`` for every word of ``title``."""
+        if not title or category_id is None:
+            return
+        category_id = str(category_id)
+        for word in set(tokenize(title)):
+            self._words[word][category_id] += 1
+            self._totals[word] += 1
+
+    def predict(self, title, limit=3):
+        """
+        Return the IDs of the categories most likely meant for ``title``.
+
+        Args:
+            title (str): Title of the transaction.
+            limit (int): Maximum number of suggestions.
+
+        Returns:
+            list: Category IDs as strings, most likely first.
+        """
+        scores = Counter()
+        for word in set(tokenize(title)):
+            counts = self._words.get(word)
+            if counts:
+                total = self._totals[word]
+                for category_id, count in counts.items():
+                    scores[category_id] += count / total
+        return [category_id for category_id, _ in scores.most_common(limit)]
+
+
+def get_category_models(context):
+    """
+    Return the application-wide cache of category models.
+
+    Args:
+        context (CallbackContext): The context of the bot.
+
+    Returns:
+        TTLCache: The cache stored in bot_data by the main script.
+    """
+    return context.bot_data['category_models']
+
+
+async def get_category_model(context):
+    """
+    Return the category model of the current user's family.
+
+    The model is built from the transaction history on first use and kept
+    for CATEGORY_MODEL_TTL seconds. If the history cannot be fetched, the
+    expired model is used if there is one, or else an empty model that is
+    not cached.
+
+    Args:
+        context (CallbackContext): The context of the bot.
+
+    Returns:
+        CategoryModel: The model of the family.
+    """
+    models = get_category_models(context)
+    key = (context.user_data.get("api_token"), "category model")
+    model = models.get(key)
+    if model is None:
+        history = await fetch_json(
+            context, "/transaction/", "transaction history", None)
+        if history is None:
+            return models.get_stale(key, CategoryModel())
+        model = CategoryModel(history)
+        models.set(key, model)
+    return model
+
+
+def get_cached_category_model(context):
+    """
+    Return the category model of the current user's family if it is loaded.
+
+    Args:
+        context (CallbackContext): The context of the bot.
+
+    Returns:
+        CategoryModel or None: The model, or None if it is not loaded yet.
+    """
+    key = (context.user_data.get("api_token"), "category model")
+    return get_category_models(context).get(key)
+
+
+def learn_transaction(context, data):
+    """
+    Update the family's model with a transaction added by the user.
+
+    Does nothing if the model is not loaded; it will include the
+    transaction when it is built from the history.
+
+    Args:
+        context (CallbackContext): The context of the bot.
+        data (dict): Transaction data with ``title`` and ``category``.
+    """
+    model = get_cached_category_model(context)
+    if model is not None:
+        model.learn(data.get('title'), data.get('category'))
@@ -0,0 +1,197 @@
+"""
+Quick Add Parser for the Family Budget Management Telegram Bot.
+
+This module turns a single line such as ``12.50 EUR groceries @card
+yesterday`` into transaction data, so power users can add a transaction with
+one /add command instead of walking through the whole conversation. The
+names in the line are resolved against the cached categories, accounts and
+currencies of the family.
+
+Syntax:
+    <amount> [currency] <category words...> [@account] [date]
+
+    The amount is required and comes first. The currency is a currency code
+    or title; it defaults to the currency of the account. The words are
+    matched against the category titles by prefix, first as a whole and then
+    one by one; unless they are just the category name, they are also used
+    as the transaction title. The account is matched by title prefix after the
+    ``@`` sign; it defaults to the first account of the user. The date is
+    ``today``, ``yesterday``, ``YYYY-MM-DD`` or ``DD.MM[.YYYY]`` and
+    defaults to today.
+
+Functions:
+    parse_quick_add(text, categories, accounts, currencies, today,
+    owner_id): Parses a quick add line into transaction data.
+"""
+import re
+from datetime import date, timedelta
+from decimal import Decimal, InvalidOperation
+
+USAGE = ("Usage: /add <amount> [currency] <category> [@account] [date]\n"
+         "Example: /add 12.50 EUR groceries @card yesterday")
+
+_ISO_DATE = re.compile(r"(\d{4})-(\d{1,2})-(\d{1,2})")
+_DOTTED_DATE = re.compile(r"(\d{1,2})\.(\d{1,2})(?:\.(\d{4}))?")
+_MAX_AMOUNT = Decimal('1000000000000')
+
+
+def _parse_amount(word):
+    """
+    Return the amount as a string, or None if ``word`` is not one.
+
+    Raises:
+        ValueError: If the amount is larger than any sane transaction.
+    """
+    try:
+        amount = Decimal(word.replace(',', '.'))
+    except InvalidOperation:
+        return None
+    if not amount.is_finite() or amount <= 0:
+        return None
+    if amount >= _MAX_AMOUNT:
+        raise ValueError(f"The amount is too large: {word}")
+    return str(amount.quantize(Decimal('0.01')))
+
+
+def _parse_date(word, today):
+    """
+    Return the date as ``YYYY-MM-DD``, or None if ``word`` is not one.
+
+    Raises:
+        ValueError: If ``word`` is written like a date but is not a valid
+            one, e.g. ``31.02``.
+    """
+    word = word.lower()
+    if word == 'today':
+        return today.strftime("%Y-%m-%d")
+    if word == 'yesterday':
+        return (today - timedelta(days=1)).strftime("%Y-%m-%d")
+    match = _ISO_DATE.fullmatch(word)
+    if match:
+        year, month, day = match.groups()
+    else:
+        match = _DOTTED_DATE.fullmatch(word)
+        if not match:
+            return None
+        day, month, year = match.groups()
+        year = year or today.year
+    try:
+        return date(int(year), int(month), int(day)).strftime("%Y-%m-%d")
+    except ValueError:
+        raise ValueError(f"Invalid date: {word}") from None
+
+
+def _match(name, items, what):
+    """
+    Return the item whose title equals or starts with ``name``.
+
+    Raises:
+        ValueError: If no item or more than one item matches.
+    """
+    name = name.lower()
+    exact = [item for item in items if item['title'].lower() == name]
+    if exact:
+        return exact[0]
+    matches = [item for item in items
+               if item['title'].lower().startswith(name)]
+    if not matches:
+        raise ValueError(f"Unknown {what}: {name}")
+    if len(matches) > 1:
+        titles = ', '.join(item['title'] for item in matches)
+        raise ValueError(f"Ambiguous {what} {name}: {titles}")
+    return matches[0]
+
+
+def _find_currency(word, currencies):
+    """Return the currency with the given code or title, or None."""
+    word = word.lower()
+    for currency in currencies:
+        if word in (str(currency.get('code', '')).lower(),
+                    str(currency.get('title', '')).lower()):
+            return currency
+    return None
+
+
+def parse_quick_add(text, categories, accounts, currencies, today,
+                    owner_id=None):
+    """
+    Parse a quick add line into transaction data.
+
+    Args:
+        text (str): The arguments of the /add command.
+        categories (list): Categories of the family.
+        accounts (list): Accounts of the family.
+        currencies (list): Available currencies.
+        today (date): Date used for ``today`` and ``yesterday``.
+        owner_id (int): ID of the user sending the command; their first
+            account is used when no account is given.
+
+    Returns:
+        dict: Transaction data in the format posted to the API.
+
+    Raises:
+        ValueError: If the line cannot be parsed; the message explains why.
+    """
+    words = text.split()
+    if not words:
+        raise ValueError(USAGE)
+    amount = _parse_amount(words.pop(0))
+    if amount is None:
+        raise ValueError("The amount must come first, e.g. 12.50")
+
+    day = None
+    if words:
+        day = _parse_date(words[-1], today)
+        if day is not None:
+            words.pop()
+    if day is None:
+        day = today.strftime("%Y-%m-%d")
+
+    account = None
+    account_words = [word for word in words if word.startswith('@')]
+    if len(account_words) > 1:
+        raise ValueError("Only one @account can be given")
+    if account_words:
+        words.remove(account_words[0])
+        account = _match(account_words[0][1:], accounts, "account")
+    else:
+        if not accounts:
+            raise ValueError("No accounts available")
+        own = [item for item in accounts if item.get('owner') == owner_id]
+        account = (own or accounts)[0]
+
+    currency = None
+    if words:
+        currency = _find_currency(words[0], currencies)
+        if currency is not None:
+            words.pop(0)
+
+    if not words:
+        raise ValueError("A category is required\n" + USAGE)
+    title = ' '.join(words)
+    try:
+        category = _match(title, categories, "category")
+        title = category['title']
+    except ValueError as exc:
+        # The words may be a free text title mentioning the category,
+        # e.g. "milk groceries".
+        for word in words:
+            try:
+                category = _match(word, categories, "category")
+                break
+            except ValueError:
+                pass
+        else:
+            raise exc
+
+    currency_id = (currency['id'] if currency is not None
+                   else account.get('currency'))
+    return {
+        'title': title,
+        'category': str(category['id']),
+        'who': str(account.get('owner', owner_id)),
+        'account': str(account['id']),
+        'amount': amount,
+        'currency': str(currency_id),
+        'date': day,
+    }
@@ -0,0 +1,106 @@
+"""
+Resilience Module for Telegram Bot.
+
+This module keeps the bot responsive while the family budget API is slow or
+failing. Idempotent requests that fail with a transient error are retried
+after a jittered exponential backoff, and a circuit breaker stops sending
+requests to an API that keeps failing, so handlers fail fast and fall back
+to cached data instead of waiting for timeouts one after another.
+
+Classes:
+    CircuitOpenError: Raised instead of sending a request while the circuit
+    is open.
+    CircuitBreaker: Tracks consecutive failures of the API and decides
+    whether requests may be sent.
+
+Functions:
+    backoff(attempt, delay, max_delay): Returns the jittered delay before
+    the next attempt.
+"""
+import random
+import time
+
+import httpx
+
+
+class CircuitOpenError(httpx.TransportError):
+    """
+    Raised instead of sending a request while the circuit is open.
+
+    It is an httpx.TransportError, so callers handle it like a request that
+    could not reach the API.
+    """
+
+
+class CircuitBreaker:
+    """
+    Tracks consecutive failures of the API.
+
+    The circuit opens after ``failure_threshold`` consecutive failures.
+    While it is open, requests are rejected. Once ``reset_timeout`` seconds
+    have passed, one trial request is let through per ``reset_timeout``;
+    its success closes the circuit and its failure keeps it open.
+
+    Attributes:
+        state (str): "closed", "open" or "half_open".
+    """
+
+    def __init__(self, failure_threshold, reset_timeout, timer=time.monotonic):
+        """
+        Initialize a closed circuit.
+
+        Args:
+            failure_threshold (int): Consecutive failures opening the
+                circuit.
+            reset_timeout (float): Seconds before a trial request is sent
+                to an open circuit.
+            timer (callable): Monotonic clock.
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self._timer = timer
+        self._failures = 0
+        self._opened_at = 0.0
+
+    def allow(self):
+        """Return whether a request may be sent now."""
+        if self.state == 'closed':
+            return True
+        if self._timer() - self._opened_at >= self.reset_timeout:
+            self.state = 'half_open'
+            self._opened_at = self._timer()
+            return True
+        return False
+
+    def record_success(self):
+        """Close the circuit after a request reached a healthy API."""
+        self._failures = 0
+        self.state = 'closed'
+
+    def record_failure(self):
+        """Count a failed request, opening the circuit if needed."""
+        self._failures += 1
+        if (self.state == 'half_open'
+                or self._failures >= self.failure_threshold):
+            self.state = 'open'
+            self._opened_at = self._timer()
+
+
+def backoff(attempt, delay, max_delay):
+    """
+    Return the delay before retrying after failed attempt ``attempt``.
+
+    The delay grows exponentially from ``delay`` up to ``max_delay`` and is
+    drawn uniformly from zero to that bound, so clients that failed at the
+    same time do not retry at the same time.
+
+    Args:
+        attempt (int): Number of the failed attempt, starting at 1.
+        delay (float): Upper bound of the delay after the first attempt.
+        max_delay (float): Upper bound of the delay.
+
+    Returns:
+        float: Seconds to wait.
+    """
+    return random.uniform(0, min(max_delay, delay * 2 ** (attempt - 1)))
@@ -0,0 +1,58 @@
+"""
+Request Coalescing Module for Telegram Bot.
+
+This module implements a "single-flight" helper that merges concurrent calls
+for the same key into one. When several family members press buttons at the
+same time, their handlers ask the API for the same lists; with this helper
+only the first caller actually sends the request and all others wait for its
+result.
+
+Classes:
+    SingleFlight: Deduplicates concurrent coroutine calls by key.
+"""
+import asyncio
+
+
+class SingleFlight:
+    """
+    Deduplicate concurrent calls that share the same key.
+
+    The result, or the raised exception, of the single running call is
+    delivered to every caller that asked for the same key while it was in
+    flight. Once the call completes the key is forgotten, so later calls
+    start a new one.
+    """
+
+    def __init__(self):
+        """Initialize the helper with no calls in flight."""
+        self._calls = {}
+
+    def __len__(self):
+        """Return the number of calls currently in flight."""
+        return len(self._calls)
+
+    async def do(self, key, func):
+        """
+        Run ``func`` once for all concurrent callers using ``key``.
+
+        Args:
+            key: Hashable key identifying the call.
+            func (callable): Coroutine function called without arguments.
+
+        Returns:
+            The result of the shared call.
+        """
+        future = self._calls.get(key)
+        if future is None:
+            future = asyncio.ensure_future(func())
+            self._calls[key] = future
+            future.add_done_callback(
+                lambda done: self._forget(key, done))
+        # Shield the shared call, so one cancelled caller does not cancel it
+        # for everybody else.
+        return await asyncio.shield(future)
+
+    def _forget(self, key, future):
+        """Remove a finished call, unless it was already replaced."""
+        if self._calls.get(key) is future:
+            del self._calls[key]
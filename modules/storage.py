@@ -0,0 +1,38 @@
+"""
+Local Storage Module for Telegram Bot.
+
+This module opens the SQLite database the bot uses to keep state on disk,
+such as transactions waiting to be sent to the API. The database runs in
+write-ahead logging mode, so appends are cheap and readers never block the
+writer.
+
+Functions:
+    connect(path): Opens the bot's SQLite database and applies the settings
+    shared by all modules that store data in it.
+"""
+import os
+import sqlite3
+
+
+def connect(path):
+    """
+    Open the SQLite database at ``path``.
+
+    The parent directory is created if needed. With ``synchronous=NORMAL``
+    in WAL mode, committed data survives a crash or restart of the bot
+    process without an fsync on every commit.
+
+    Args:
+        path (str): Path of the database file.
+
+    Returns:
+        sqlite3.Connection: The open connection.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    connection = sqlite3.connect(path)
+    connection.row_factory = sqlite3.Row
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    return connection
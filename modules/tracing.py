@@ -0,0 +1,309 @@
+"""
+Tracing Module for Telegram Bot.
+
+Adding a transaction takes a conversation of several updates, each handled
+by a different handler that may call the API, followed by the delivery of
+the transaction from the outbox. This module records the steps as spans of
+one trace, so the time from pressing "Add Transaction" to the transaction
+being stored by the API can be broken down per step.
+
+A trace is started by the first handler of a transaction and kept in the
+user's user_data, so the handlers of the following updates join it, even
+after a restart of the bot. While a handler runs, its span is the current
+span of the task, and the API requests it sends are recorded as children of
+it. When the transaction is saved to the outbox, the trace is handed to the
+outbox, which records the delivery and the time-to-commit.
+
+Finished spans are passed to the configured exporter. Tracing is disabled,
+and costs next to nothing, while no exporter is set.
+
+Classes:
+    Span: One timed step of a trace.
+    JsonLinesExporter: Writes finished spans as JSON lines to standard
+    output or a file.
+
+Functions:
+    set_exporter(exporter): Sets the object finished spans are passed to.
+    configure(target): Sets a JsonLinesExporter for TRACE_EXPORTER.
+    span(name, trace_id, parent_id, **attributes): Context manager timing
+    a span.
+    traced(callback): Decorator recording a handler in the user's trace.
+    starts_trace(callback): Decorator starting a new trace for a handler.
+    end_trace(context, status): Ends the conversation part of the trace.
+    record_delivery(trace, created, status, attempts, committed): Records
+    the delivery of a transaction by the outbox.
+"""
+import contextlib
+import contextvars
+import functools
+import json
+import logging
+import sys
+import time
+import uuid
+
+_exporter = None
+_current = contextvars.ContextVar('current_span', default=None)
+
+
+def _new_id():
+    """Return a random span or trace ID."""
+    return uuid.uuid4().hex[:16]
+
+
+class Span:
+    """
+    One timed step of a trace.
+
+    Attributes:
+        name (str): What the step did, e.g. the handler name.
+        trace_id (str): ID shared by all spans of the trace.
+        span_id (str): ID of this span.
+        parent_id (str): ID of the enclosing span, or None.
+        start (float): Wall clock time the span started at.
+        duration (float): Seconds the span took, set when it finished.
+        status (str): "ok", "error", or how a trace ended.
+        attributes (dict): Further details of the step.
+    """
+
+    def __init__(self, name, trace_id, parent_id=None, start=None,
+                 span_id=None, **attributes):
+        """Start the span now or at the wall clock time ``start``."""
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = span_id or _new_id()
+        self.parent_id = parent_id
+        self.start = time.time() if start is None else start
+        self.duration = None
+        self.status = 'ok'
+        self.attributes = attributes
+
+    def finish(self, end=None):
+        """Set the duration, up to now or the wall clock time ``end``."""
+        self.duration = (time.time() if end is None else end) - self.start
+
+    def to_dict(self):
+        """Return the span as a JSON serializable dictionary."""
+        return {'name': self.name, 'trace_id': self.trace_id,
+                'span_id': self.span_id, 'parent_id': self.parent_id,
+                'start': self.start, 'duration': self.duration,
+                'status': self.status, 'attributes': self.attributes}
+
+
+class JsonLinesExporter:
+    """Writes finished spans as JSON lines to standard output or a file."""
+
+    def __init__(self, path=None):
+        """
+        Initialize the exporter.
+
+        Args:
+            path (str): File the spans are appended to; standard output is
+                used if None.
+        """
+        if path is None:
+            self._stream, self._owned = sys.stdout, False
+        else:
+            self._stream = open(path, 'a', buffering=1, encoding='utf-8')
+            self._owned = True
+
+    def export(self, span):
+        """Write ``span`` as one line."""
+        self._stream.write(json.dumps(span.to_dict()) + '\n')
+
+    def close(self):
+        """Close the file, if the exporter opened one."""
+        if self._owned:
+            self._stream.close()
+
+
+def set_exporter(exporter):
+    """
+    Set the object finished spans are passed to.
+
+    The previous exporter is closed if it has a ``close`` method.
+
+    Args:
+        exporter: Object with an ``export(span)`` method, or None to
+            disable tracing.
+    """
+    global _exporter
+    previous, _exporter = _exporter, exporter
+    if previous is not None and hasattr(previous, 'close'):
+        previous.close()
+
+
+def configure(target):
+    """
+    Set the exporter described by ``target``.
+
+    Args:
+        target (str): "stdout", the path of a file, or None to disable
+            tracing.
+    """
+    if not target:
+        set_exporter(None)
+    elif target == 'stdout':
+        set_exporter(JsonLinesExporter())
+    else:
+        set_exporter(JsonLinesExporter(target))
+
+
+def _export(span):
+    """Pass ``span`` to the exporter, logging instead of raising errors."""
+    if _exporter is None:
+        return
+    try:
+        _exporter.export(span)
+    except Exception as exc:
+        logging.error(f"Failed to export span {span.name}: {exc!r}")
+
+
+@contextlib.contextmanager
+def span(name, trace_id=None, parent_id=None, **attributes):
+    """
+    Time the enclosed block as a span.
+
+    Without ``trace_id`` the span is a child of the current span, and
+    nothing is recorded outside of a trace. The span is the current span
+    of the task while the block runs.
+
+    Args:
+        name (str): Name of the span.
+        trace_id (str): Trace the span belongs to.
+        parent_id (str): Span the span is a child of.
+        **attributes: Details of the span.
+
+    Yields:
+        Span or None: The span, to add attributes to, or None if it is
+        not recorded.
+    """
+    if _exporter is None:
+        yield None
+        return
+    if trace_id is None:
+        parent = _current.get()
+        if parent is None:
+            yield None
+            return
+        trace_id, parent_id = parent.trace_id, parent.span_id
+    current = Span(name, trace_id, parent_id, **attributes)
+    token = _current.set(current)
+    try:
+        yield current
+    except BaseException as exc:
+        current.status = 'error'
+        current.attributes['error'] = repr(exc)
+        raise
+    finally:
+        _current.reset(token)
+        current.finish()
+        _export(current)
+
+
+def traced(callback):
+    """
+    Record a handler callback as a span of the user's trace.
+
+    Handlers of users without a started trace run unrecorded.
+
+    Args:
+        callback (callable): Coroutine function taking update and context.
+
+    Returns:
+        callable: The wrapped callback, with the same name.
+    """
+    name = callback.__name__
+
+    @functools.wraps(callback)
+    async def wrapper(update, context):
+        trace = None
+        if _exporter is not None and context.user_data is not None:
+            trace = context.user_data.get('trace')
+        if trace is None:
+            return await callback(update, context)
+        with span(name, trace['trace_id'], trace['span_id']):
+            return await callback(update, context)
+
+    return wrapper
+
+
+def starts_trace(callback):
+    """
+    Start a new trace for a handler callback and record it as a span.
+
+    A trace the user left unfinished, e.g. by abandoning the conversation,
+    is ended with the ``abandoned`` status first.
+
+    Args:
+        callback (callable): Coroutine function taking update and context.
+
+    Returns:
+        callable: The wrapped callback, with the same name.
+    """
+    wrapped = traced(callback)
+
+    @functools.wraps(callback)
+    async def wrapper(update, context):
+        if _exporter is not None and context.user_data is not None:
+            end_trace(context, 'abandoned')
+            context.user_data['trace'] = {
+                'trace_id': _new_id(), 'span_id': _new_id(),
+                'start': time.time()}
+        return await wrapped(update, context)
+
+    return wrapper
+
+
+def end_trace(context, status='ok'):
+    """
+    End the conversation part of the user's trace.
+
+    Records the root span of the trace, from its start until now, and
+    removes the trace from user_data.
+
+    Args:
+        context (CallbackContext): The context of the bot.
+        status (str): How the conversation ended, e.g. "cancelled".
+
+    Returns:
+        dict or None: The trace, to pass on to the outbox, or None if the
+        user has no trace.
+    """
+    if context.user_data is None:
+        return None
+    trace = context.user_data.pop('trace', None)
+    if trace is None or _exporter is None:
+        return trace
+    root = Span('transaction', trace['trace_id'], start=trace['start'],
+                span_id=trace['span_id'])
+    root.status = status
+    root.finish()
+    _export(root)
+    return trace
+
+
+def record_delivery(trace, created, status, attempts, committed):
+    """
+    Record the delivery of a transaction by the outbox.
+
+    The span lasts from saving the transaction to the outbox until the
+    API answered for the last time. Its ``time_to_commit`` attribute is
+    the time from the start of the trace.
+
+    Args:
+        trace (dict): The trace returned by end_trace, or None.
+        created (float): Wall clock time the transaction was saved.
+        status (int): The last response status, or None.
+        attempts (int): Number of delivery attempts.
+        committed (bool): Whether the API stored the transaction.
+    """
+    if trace is None or _exporter is None:
+        return
+    delivery = Span('deliver', trace['trace_id'], trace['span_id'],
+                    start=created, http_status=status, attempts=attempts)
+    delivery.status = 'ok' if committed else 'failed'
+    delivery.finish()
+    delivery.attributes['time_to_commit'] = (
+        delivery.start + delivery.duration - trace['start'])
+    _export(delivery)
@@ -11,57 +11,142 @@ Functions:
     add_transaction(update, context): Initiates the Add Transaction process
                                       by asking the user to enter the title
                                       of the transaction.
+    prefetch_reference_data(context): Loads the data of all steps of the
+                                      conversation into the caches.
     receive_title(update, context, api_base_url): Receives the transaction
                                                   title from the user and
                                                   prompts for category
                                                   selection.
+    quick_add(update, context): Adds a transaction described in a single
+                                /add command.
 
 Note:
     The functions in this module are designed to work within the context of a
     Telegram bot and rely on the bot's update and context objects, as well as
     the API's base URL for fetching necessary data.
 """
+import asyncio
+from datetime import date
 
-from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
+from telegram import Update
 from telegram.ext import CallbackContext
 
-from modules.api import get_categories
+import modules.constants
+from modules.api import (get_account_choices, get_account_keyboard,
+                         get_categories, get_category_choices, get_currencies)
+from modules.cache import fetch_reference
 from modules.constants import CATEGORY, TITLE
+from modules.metrics import timed_handler
+from modules.outbox import get_outbox
+from modules.prediction import (get_cached_category_model, get_category_model,
+                                learn_transaction)
+from modules.quick_add import USAGE, parse_quick_add
+from modules.tracing import end_trace, starts_trace, traced
 
 
+@timed_handler
+@starts_trace
 async def add_transaction(update: Update, context: CallbackContext):
     """
     Initiate the Add Transaction process.
 
-    Asks the user to enter the title of the transaction.
+    Asks the user to enter the title of the transaction. While the user
+    types, the data of all following steps is loaded in the background.
     """
     query = update.callback_query
     await query.answer()
+    if context.user_data.get('api_token'):
+        context.application.create_task(
+            prefetch_reference_data(context), update=update)
     await query.edit_message_text(text=(
         "Add new transaction:\n"
         "  Enter the title of the transaction:"))
     return TITLE
 
 
+async def prefetch_reference_data(context: CallbackContext):
+    """
+    Load the data of all steps of the conversation into the caches.
+
+    The steps request the same data when they are reached and either find
+    it cached or join the request that is still in flight.
+    """
+    await asyncio.gather(
+        get_category_choices(context), get_category_model(context),
+        get_account_keyboard(context), get_currencies(context))
+
+
+@timed_handler
+@traced
 async def receive_title(update: Update,
                         context: CallbackContext):
     """
     Receive the title of the transaction.
 
-    Prompts for the category selection after receiving the title.
+    Prompts for the category selection after receiving the title. If
+    categories were used for similar titles before, only those are offered,
+    with a button to show all categories. The suggestions need the category
+    model, which add_transaction loads in the background; until it is
+    loaded, all categories are shown instead of waiting for the history.
     """
     if 'transaction_data' not in context.user_data:
         context.user_data['transaction_data'] = {}
     text = update.message.text
     context.user_data['transaction_data']['title'] = text
 
-    categories = get_categories(context)
-    keyboard = [
-        [InlineKeyboardButton(
-            category['title'], callback_data=f"category_{category['id']}")]
-        for category in categories
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
+    choices = await get_category_choices(context)
+    model = get_cached_category_model(context)
+    reply_markup = None
+    if model is not None:
+        suggestions = model.predict(
+            text, limit=modules.constants.CATEGORY_SUGGESTIONS)
+        reply_markup = choices.suggestion_markup(
+            suggestions, 'category', 'category_page')
+    if reply_markup is None:
+        reply_markup = choices.page(0, 'category', 'category_page')
     await update.message.reply_text(
-        "Select a category:", reply_markup=reply_markup)
+        "Select a category or type a few letters to search:",
+        reply_markup=reply_markup)
     return CATEGORY
+
+
+@timed_handler
+@starts_trace
+async def quick_add(update: Update, context: CallbackContext):
+    """
+    Add a transaction described in a single /add command.
+
+    Parses a line like ``/add 12.50 EUR groceries @card yesterday`` against
+    the cached categories, accounts and currencies and saves the transaction
+    to the outbox, skipping the step-by-step conversation.
+    """
+    if not context.user_data.get('api_token'):
+        end_trace(context, 'rejected')
+        await update.message.reply_text("Please use /start first.")
+        return
+    if not context.args:
+        end_trace(context, 'rejected')
+        await update.message.reply_text(USAGE)
+        return
+
+    categories, accounts, currencies, user_details = await asyncio.gather(
+        get_categories(context), get_account_choices(context),
+        get_currencies(context),
+        fetch_reference(context, "/users/me/", "user details", build=dict))
+    try:
+        data = parse_quick_add(
+            ' '.join(context.args), categories, accounts, currencies,
+            date.today(), owner_id=user_details.get('id'))
+    except ValueError as exc:
+        end_trace(context, 'rejected')
+        await update.message.reply_text(str(exc))
+        return
+
+    get_outbox(context).append(
+        data, context.user_data.get('api_token'),
+        user_id=update.effective_user.id,
+        chat_id=update.effective_chat.id, trace=end_trace(context))
+    learn_transaction(context, data)
+    await update.message.reply_text(
+        f"Transaction queued: {data['title']}, {data['amount']} on "
+        f"{data['date']}. It will be sent to the budget shortly.")
@@ -0,0 +1,93 @@
+"""
+Update Processor Module for Telegram Bot.
+
+This module lets the bot process updates of different users concurrently,
+so one family's slow request no longer delays everybody else, while the
+updates of a single user in a single chat are still handled strictly one
+after another. Keeping those in order is what the per-chat, per-user
+ConversationHandler of the add-transaction flow relies on.
+
+Classes:
+    OrderedUpdateProcessor: Processes updates concurrently, keeping the
+    updates of each chat and user in order.
+"""
+import asyncio
+import sys
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+
+class OrderedUpdateProcessor(BaseUpdateProcessor):
+    """
+    Process updates concurrently while keeping per-user order.
+
+    Updates that share the same chat and user wait for each other in the
+    order they arrived; all other updates run in parallel, up to
+    ``max_concurrent_updates`` at a time.
+
+    An update only takes one of the ``max_concurrent_updates`` slots once
+    the earlier updates of its user are done, so a user tapping quickly
+    cannot occupy every slot with updates that are just waiting for each
+    other. The semaphore of BaseUpdateProcessor, which is taken before
+    do_process_update is called, is therefore made practically unlimited.
+    """
+
+    def __init__(self, max_concurrent_updates):
+        """
+        Initialize the processor.
+
+        Args:
+            max_concurrent_updates (int): Maximum number of updates that are
+                processed at the same time.
+        """
+        super().__init__(sys.maxsize)
+        if max_concurrent_updates < 1:
+            raise ValueError(
+                "`max_concurrent_updates` must be a positive integer!")
+        self._max_concurrent_updates = max_concurrent_updates
+        self._slots = None
+        self._locks = {}
+
+    @staticmethod
+    def _key(update):
+        """Return the ordering key of ``update``, or None if it has none."""
+        if not isinstance(update, Update):
+            return None
+        chat = update.effective_chat
+        user = update.effective_user
+        if chat is None and user is None:
+            return None
+        return (chat.id if chat else None, user.id if user else None)
+
+    async def do_process_update(self, update, coroutine):
+        """
+        Await ``coroutine`` after earlier updates of the same user.
+
+        A processing slot is taken only after the user's lock is acquired.
+        """
+        key = self._key(update)
+        if key is None:
+            async with self._slots:
+                await coroutine
+            return
+
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0], self._slots:
+                await coroutine
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[key]
+
+    async def initialize(self):
+        """Create the processing slots in the running event loop."""
+        self._slots = asyncio.BoundedSemaphore(self.max_concurrent_updates)
+
+    async def shutdown(self):
+        """Forget the locks of all users."""
+        self._locks.clear()
@@ -7,59 +7,96 @@ of user IDs to their respective usernames. These functions are essential for
 identifying users and associating transactions with the correct user accounts
 in the bot's operation.
 
+Classes:
+    UserDirectory: The family's users together with an index of usernames
+    by user ID.
+
 Functions:
-    get_users(context, api_base_url): Fetches and returns a list of users from
-    the API.
-    get_user_mapping(context, api_base_url): Creates a dictionary mapping user
-    IDs to usernames.
+    get_user_directory(context): Returns the user directory of the family.
+    get_users(context): Fetches and returns a list of users from the API.
+    get_user_mapping(context): Creates a dictionary mapping user IDs to
+    usernames.
 
 Note:
-    Both functions require the bot's context and the API's base URL to function
-    correctly. They also handle potential errors by logging failed fetch
-    attempts.
+    The functions are coroutines that use the shared API client stored in
+    the bot's context. The user directory is built once per user, i.e. per
+    API token scope, and kept in the reference data cache, so the accounts,
+    profile and transaction steps of a user share a single /users/ request.
+    They also handle potential errors by logging failed fetch attempts.
+
+    The directory is deliberately not shared by the members of a family.
+    The API answers /users/ for the family of the token owner, and the bot
+    does not know which family a token belongs to without asking
+    /users/me/ first, which costs one request per user just like /users/.
+    Keying by token also means a user removed from a family stops seeing
+    its members as soon as their own cached list expires.
 """
 
-import logging
+from operator import itemgetter
+
+from modules.cache import fetch_reference
+from modules.keyboards import Choices
+
+
+class UserDirectory:
+    """
+    The users of a family, indexed by user ID.
+
+    Attributes:
+        users (list): User data as returned by the API.
+        usernames (dict): Mapping of user IDs to usernames.
+        choices (Choices): The users for the user keyboard.
+    """
+
+    def __init__(self, users):
+        """
+        Build the directory from the API user list.
 
-import requests
-import urllib3
+        Args:
+            users (list): User data as returned by the API.
+        """
+        self.users = users
+        self.usernames = {user['id']: user['username'] for user in users}
+        self.choices = Choices(users, label=itemgetter('username'))
 
-import modules.constants
+    def __len__(self):
+        """Return the number of users in the directory."""
+        return len(self.users)
 
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+    def username(self, user_id, default='Unknown'):
+        """Return the username of ``user_id``, or ``default``."""
+        return self.usernames.get(user_id, default)
 
 
-def get_users(context):
+async def get_user_directory(context):
+    """
+    Return the user directory of the current user's family.
+
+    The directory is cached per API token, not per family; see the module
+    docstring for why.
+
+    Returns:
+        UserDirectory: The cached directory, or an empty one if the users
+        cannot be fetched.
+    """
+    return await fetch_reference(context, "/users/", "users",
+                                 build=UserDirectory)
+
+
+async def get_users(context):
     """
     Fetch and return the list of users from the API.
 
     Logs an error if the fetch fails.
     """
-    headers = {'Authorization': f'Token {context.user_data.get("api_token")}'}
-    response = requests.get(
-        modules.constants.API_BASE_URL + "/users/",
-        headers=headers,
-        verify=False)
-    if response.status_code == 200:
-        return response.json()
-    else:
-        logging.error(f"Failed to fetch users: {response.status_code}")
-        return []
-
-
-def get_user_mapping(context):
+    return (await get_user_directory(context)).users
+
+
+async def get_user_mapping(context):
     """
     Fetch and return a mapping of user IDs to usernames from the API.
 
     Returns:
         dict: A dictionary mapping user IDs to usernames.
     """
-    headers = {'Authorization': f'Token {context.user_data.get("api_token")}'}
-    response = requests.get(modules.constants.API_BASE_URL + "/users/",
-                            headers=headers, verify=False)
-    if response.status_code == 200:
-        users = response.json()
-        return {user['id']: user['username'] for user in users}
-    else:
-        logging.error(f"Failed to fetch users: {response.status_code}")
-        return {}
+    return (await get_user_directory(context)).usernames
@@ -14,38 +14,74 @@ manageable as the bot scales up in complexity.
 Functions:
     create_calendar(year, month): Generates an inline keyboard calendar for
     the specified year and month, providing an interactive and user-friendly
-    method for date selection in the bot.
+    method for date selection in the bot. Calendars are memoized, since the
+    markup never changes.
+    warm_calendar_cache(today, months): Builds the calendars of the months
+    around today ahead of time.
 """
 import calendar
+import functools
 
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
 
+import modules.constants
+from modules.callbacks import encode
+
+DAYS_OF_WEEK = ("Mo", "Tu", "We", "Th", "Fr", "Sa", "Su")
+
+
+def _month_and_day_names(year, month, locale, firstweekday):
+    """Return the calendar title and the weekday headers."""
+    if locale is None:
+        title = f"{calendar.month_name[month]} {year}"
+        days = DAYS_OF_WEEK[firstweekday:] + DAYS_OF_WEEK[:firstweekday]
+        return title, days
+    locale_calendar = calendar.LocaleTextCalendar(firstweekday, locale)
+    title = locale_calendar.formatmonthname(year, month, 0).strip()
+    days = tuple(locale_calendar.formatweekday(day, 2).strip()
+                 for day in locale_calendar.iterweekdays())
+    return title, days
+
 
 def create_calendar(year, month):
     """
     Create an inline keyboard calendar.
 
-    Generates a calendar for the specified year and month.
+    Generates a calendar for the specified year and month in the configured
+    locale and first day of the week. The markup is immutable, so it is
+    built once and the same object is returned for repeated calls.
+
+    Args:
+        year (int): Year to display.
+        month (int): Month to display.
     """
+    return _build_calendar(year, month, modules.constants.CALENDAR_LOCALE,
+                           modules.constants.CALENDAR_FIRSTWEEKDAY)
+
+
+@functools.lru_cache(maxsize=128)
+def _build_calendar(year, month, locale, firstweekday):
+    """Build the calendar markup; memoized by all arguments."""
+    title, days_of_week = _month_and_day_names(
+        year, month, locale, firstweekday)
+    ignore = encode('ignore')
     keyboard_structure = []
     keyboard_structure.append(
-        (InlineKeyboardButton(
-            f"{calendar.month_name[month]} {year}",
-            callback_data="ignore"),))
+        (InlineKeyboardButton(title, callback_data=ignore),))
 
-    days_of_week = ["Mo", "Tu", "We", "Th", "Fr", "Sa", "Su"]
     keyboard_structure.append(
-        tuple(InlineKeyboardButton(day, callback_data="ignore")
+        tuple(InlineKeyboardButton(day, callback_data=ignore)
               for day in days_of_week))
 
-    month_calendar = calendar.monthcalendar(year, month)
+    month_calendar = calendar.Calendar(firstweekday).monthdayscalendar(
+        year, month)
     for week in month_calendar:
         row = tuple(
             InlineKeyboardButton(
                 str(day),
-                callback_data=f"calendar-day-{year}-{month}-{day}")
+                callback_data=encode('calendar_day', year, month, day))
             if day != 0 else InlineKeyboardButton(
-                " ", callback_data="ignore") for day in week)
+                " ", callback_data=ignore) for day in week)
         keyboard_structure.append(row)
 
     previous_month = month - 1 if month > 1 else 12
@@ -55,11 +91,26 @@ def create_calendar(year, month):
     navigation_row = (
         InlineKeyboardButton(
             "<",
-            callback_data=f"calendar-month-{previous_year}-{previous_month}"),
+            callback_data=encode(
+                'calendar_month', previous_year, previous_month)),
         InlineKeyboardButton(
             ">",
-            callback_data=f"calendar-month-{next_year}-{next_month}")
+            callback_data=encode('calendar_month', next_year, next_month))
     )
     keyboard_structure.append(navigation_row)
 
     return InlineKeyboardMarkup(inline_keyboard=tuple(keyboard_structure))
+
+
+def warm_calendar_cache(today, months=2):
+    """
+    Build the calendars around ``today`` ahead of time.
+
+    Args:
+        today (date): The current date.
+        months (int): Number of months before and after the current month
+            to build.
+    """
+    for offset in range(-months, months + 1):
+        year, month = divmod(today.year * 12 + today.month - 1 + offset, 12)
+        create_calendar(year, month + 1)
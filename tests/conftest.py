@@ -0,0 +1,19 @@
+"""
+Shared set up of the tests.
+
+main reads its configuration from the environment when it is imported, so
+the variables are set here, before any test module imports it, and point
+the bot's database at a temporary directory.
+"""
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+os.environ.setdefault('TELEGRAM_TOKEN', '1:test')
+os.environ.setdefault('API_BASE_URL', 'http://api.test')
+os.environ.setdefault('METRICS_PORT', '0')
+os.environ['DATABASE_PATH'] = os.path.join(
+    tempfile.mkdtemp(prefix='bot-tests-'), 'bot.sqlite3')
@@ -0,0 +1,165 @@
+"""
+Tests that every button press runs exactly one handler chain.
+
+The application is built by main.build_application with a stub Telegram
+request, and the callbacks of all handlers are replaced by recorders, so
+no request leaves the test. A press of every callback action is processed
+outside of the add-transaction conversation and in each of its states.
+"""
+import asyncio
+import json
+
+import pytest
+from telegram import CallbackQuery, Chat, Message, Update, User
+from telegram.ext import CallbackQueryHandler, ConversationHandler
+from telegram.request import BaseRequest
+
+import main
+import modules.constants
+from modules.callbacks import ACTIONS, encode
+
+CHAT_ID = USER_ID = 42
+STATE_NAMES = ('TITLE', 'CATEGORY', 'WHO', 'ACCOUNT', 'AMOUNT', 'CURRENCY',
+               'DATE')
+STATES = {name: getattr(modules.constants, name) for name in STATE_NAMES}
+
+# The handler expected for a press of each action claimed by the
+# conversation, in the state that handles it.
+OWNERS = {
+    ('category', 'CATEGORY'): 'handle_category_selection',
+    ('category_page', 'CATEGORY'): 'handle_page',
+    ('who', 'WHO'): 'handle_who_selection',
+    ('who_page', 'WHO'): 'handle_page',
+    ('account', 'ACCOUNT'): 'handle_account_selection',
+    ('account_page', 'ACCOUNT'): 'handle_page',
+    ('currency', 'CURRENCY'): 'receive_currency',
+    ('calendar_day', 'DATE'): 'handle_calendar_callback',
+    ('calendar_month', 'DATE'): 'handle_calendar_callback',
+}
+DISPATCHED = {
+    'account_status': 'handle_account_status',
+    'family_status': 'handle_family_status',
+    'profile': 'handle_profile',
+    'ignore': 'ignore',
+}
+ARGUMENTS = {0: (), 1: (1,), 2: (2024, 5), 3: (2024, 5, 10)}
+
+
+class StubRequest(BaseRequest):
+    """Answers every Telegram method without a network connection."""
+
+    async def initialize(self):
+        """Do nothing, there is no connection to open."""
+
+    async def shutdown(self):
+        """Do nothing, there is no connection to close."""
+
+    @property
+    def read_timeout(self):
+        """Return no timeout."""
+        return None
+
+    async def do_request(self, url, method, request_data=None, **kwargs):
+        """Answer getMe with the bot user and everything else with True."""
+        result = True
+        if url.endswith('/getMe'):
+            result = {'id': 1, 'is_bot': True, 'first_name': 'Bot',
+                      'username': 'test_bot'}
+        return 200, json.dumps({'ok': True, 'result': result}).encode()
+
+
+def _record(calls, callback):
+    """Return a stand-in for ``callback`` recording its name in ``calls``."""
+    name = callback.__name__
+
+    async def recorder(update, context):
+        calls.append(name)
+
+    return recorder
+
+
+def _instrument(application, calls):
+    """Replace all handler callbacks of group 0 by recorders."""
+    conversation = None
+    for handler in application.handlers[0]:
+        if isinstance(handler, ConversationHandler):
+            conversation = handler
+            nested = list(handler.entry_points) + list(handler.fallbacks)
+            for state_handlers in handler.states.values():
+                nested.extend(state_handlers)
+            for inner in nested:
+                inner.callback = _record(calls, inner.callback)
+        elif (isinstance(handler, CallbackQueryHandler)
+              and getattr(handler.callback, '__name__', '') == 'dispatch'):
+            dispatcher = handler.callback.__self__
+            dispatcher.fallback = _record(calls, dispatcher.fallback)
+            for action, callback in list(dispatcher._routes.items()):
+                dispatcher._routes[action] = _record(calls, callback)
+        else:
+            handler.callback = _record(calls, handler.callback)
+    return conversation
+
+
+def _press(data, update_id):
+    """Return a callback query update from the test user carrying ``data``."""
+    user = User(USER_ID, 'User', False)
+    chat = Chat(CHAT_ID, Chat.PRIVATE)
+    message = Message(1, None, chat, text='menu')
+    query = CallbackQuery(str(update_id), user, chat_instance='1',
+                          data=data, message=message)
+    return Update(update_id, callback_query=query)
+
+
+def _presses():
+    """Return the callback data of every action and of malformed data."""
+    presses = {action: encode(action, *ARGUMENTS[arity])
+               for action, (_, arity) in ACTIONS.items()}
+    presses['malformed'] = 'not callback data'
+    return presses
+
+
+def _run(state):
+    """
+    Press every button in ``state`` of the conversation.
+
+    Returns:
+        dict: The group 0 callbacks run for each press.
+    """
+    async def run():
+        application = main.build_application(request=StubRequest())
+        calls = []
+        conversation = _instrument(application, calls)
+        ran = {}
+        async with application:
+            for number, (action, data) in enumerate(_presses().items()):
+                conversation._conversations.clear()
+                if state is not None:
+                    conversation._conversations[(CHAT_ID, USER_ID)] = (
+                        STATES[state])
+                calls.clear()
+                await application.process_update(_press(data, number + 1))
+                ran[action] = list(calls)
+        application.bot_data['database'].close()
+        return ran
+
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize('state', [None] + list(STATE_NAMES))
+def test_every_press_runs_one_handler_chain(state):
+    """Every press runs exactly one group 0 callback."""
+    for action, calls in _run(state).items():
+        assert len(calls) == 1, (action, state, calls)
+
+
+@pytest.mark.parametrize('state', [None] + list(STATE_NAMES))
+def test_presses_reach_their_owner(state):
+    """Presses run the handler owning the action, or the fallback."""
+    for action, calls in _run(state).items():
+        if action == 'add_transaction' and state is None:
+            expected = 'add_transaction'
+        elif action in DISPATCHED:
+            expected = DISPATCHED[action]
+        else:
+            expected = OWNERS.get((action, state), 'expired_button')
+        assert calls == [expected], (action, state)
@@ -0,0 +1,115 @@
+"""
+Callback Dispatch Benchmark.
+
+This script measures what routing one button press costs, comparing the
+regular expression handlers the bot registered before with the versioned
+callback data and the CallbackDispatcher of modules.callbacks. It reports
+the mean time per update to find the matching handler, the time to decode
+callback data and the size of the callback data.
+
+Usage:
+    python tools/bench_callbacks.py --number 100000
+
+The dispatcher column includes the dictionary lookup of the route, but not
+the call of the handler itself.
+"""
+import argparse
+import os
+import sys
+import timeit
+
+from telegram import CallbackQuery, Update, User
+from telegram.ext import CallbackQueryHandler
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules import callbacks  # noqa: E402
+
+LEGACY_PATTERNS = ('^category_', '^who_', '^account_status$', '^calendar-',
+                   '^currency_', '^profile$', '^family_status$')
+
+PRESSES = {
+    'category': ('category_12', callbacks.encode('category', 12)),
+    'currency': ('currency_3', callbacks.encode('currency', 3)),
+    'calendar_day': ('calendar-day-2024-12-31',
+                     callbacks.encode('calendar_day', 2024, 12, 31)),
+    'family_status': ('family_status', callbacks.encode('family_status')),
+}
+
+
+async def _noop(update, context):
+    """Stand in for a handler callback."""
+
+
+def _update(data):
+    """Build a callback query update carrying ``data``."""
+    user = User(1, 'User', False)
+    query = CallbackQuery('1', user, chat_instance='1', data=data)
+    return Update(1, callback_query=query)
+
+
+def _route(handlers, update):
+    """Return the first handler accepting ``update``, like the Application."""
+    for handler in handlers:
+        check = handler.check_update(update)
+        if check is not None and check is not False:
+            return handler.callback
+    return None
+
+
+def _route_dispatched(handlers, update):
+    """Return the callback the dispatcher behind ``handlers`` would call."""
+    handler = _route(handlers, update)
+    return handler.__self__.route(update.callback_query.data)
+
+
+def _legacy_handlers():
+    """Return one regex handler per prefix, as registered before."""
+    return [CallbackQueryHandler(_noop, pattern=pattern)
+            for pattern in LEGACY_PATTERNS]
+
+
+def _dispatcher_handlers():
+    """Return the single handler routing through a CallbackDispatcher."""
+    dispatcher = callbacks.CallbackDispatcher(fallback=_noop)
+    for action in ('category', 'who', 'account_status', 'calendar_day',
+                   'calendar_month', 'currency', 'profile', 'family_status'):
+        dispatcher.register(action, _noop)
+    return [CallbackQueryHandler(dispatcher.dispatch,
+                                 pattern=dispatcher.pattern)]
+
+
+def _microseconds(statement, number):
+    """Return the mean run time of ``statement`` in microseconds."""
+    return timeit.timeit(statement, number=number) / number * 1e6
+
+
+def main():
+    """Parse the command line and print the measurements."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--number', type=int, default=100_000,
+                        help='repetitions per measurement')
+    args = parser.parse_args()
+
+    legacy = _legacy_handlers()
+    dispatched = _dispatcher_handlers()
+    print(f"{'press':<15}{'bytes':>12}{'regex us':>10}{'dispatch us':>13}"
+          f"{'decode us':>11}{'cached us':>11}")
+    for name, (old, new) in PRESSES.items():
+        old_update, new_update = _update(old), _update(new)
+        assert _route(legacy, old_update) is not None
+        assert _route_dispatched(dispatched, new_update) is _noop
+        regex = _microseconds(lambda: _route(legacy, old_update),
+                              args.number)
+        dispatch = _microseconds(
+            lambda: _route_dispatched(dispatched, new_update),
+            args.number)
+        uncached = _microseconds(
+            lambda: callbacks.decode.__wrapped__(new), args.number)
+        cached = _microseconds(lambda: callbacks.decode(new), args.number)
+        print(f"{name:<15}{len(old):>5} -> {len(new):<4}{regex:>10.3f}"
+              f"{dispatch:>13.3f}{uncached:>11.3f}{cached:>11.3f}")
+
+
+if __name__ == '__main__':
+    main()
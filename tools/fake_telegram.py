@@ -0,0 +1,122 @@
+"""
+Fake Telegram Update Sender.
+
+This script posts synthetic Telegram updates to the bot's webhook server, so
+webhook mode can be tested locally without Telegram. It sends either text
+messages or inline button presses, signed with the webhook secret token the
+same way Telegram does.
+
+Usage:
+    python tools/fake_telegram.py --secret SECRET --text /start
+    python tools/fake_telegram.py --callback add_transaction --count 100 \
+        --users 10
+
+Note:
+    The bot still sends its replies to the real Telegram Bot API, which
+    rejects them for the fake chats; check the bot's log for the handling of
+    the updates.
+"""
+import argparse
+import asyncio
+import itertools
+import time
+
+import httpx
+
+_update_ids = itertools.count(1)
+
+
+def build_message(user_id, text):
+    """Build a Telegram text message update sent by ``user_id``."""
+    user = {'id': user_id, 'is_bot': False, 'first_name': f"User{user_id}"}
+    message = {
+        'message_id': next(_update_ids),
+        'date': int(time.time()),
+        'chat': {'id': user_id, 'type': 'private'},
+        'from': user,
+        'text': text,
+    }
+    if text.startswith('/'):
+        command = text.split()[0]
+        message['entities'] = [
+            {'type': 'bot_command', 'offset': 0, 'length': len(command)}]
+    return {'update_id': next(_update_ids), 'message': message}
+
+
+def build_callback(user_id, data):
+    """Build a Telegram inline button update pressed by ``user_id``."""
+    user = {'id': user_id, 'is_bot': False, 'first_name': f"User{user_id}"}
+    return {
+        'update_id': next(_update_ids),
+        'callback_query': {
+            'id': str(next(_update_ids)),
+            'from': user,
+            'chat_instance': str(user_id),
+            'data': data,
+            'message': {
+                'message_id': next(_update_ids),
+                'date': int(time.time()),
+                'chat': {'id': user_id, 'type': 'private'},
+                'text': 'Please choose:',
+            },
+        },
+    }
+
+
+async def send_updates(url, secret, updates, concurrency):
+    """
+    Post ``updates`` to the webhook with at most ``concurrency`` in flight.
+
+    Returns:
+        list: Response status codes, in order.
+    """
+    headers = {}
+    if secret:
+        headers['X-Telegram-Bot-Api-Secret-Token'] = secret
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(headers=headers) as client:
+        async def send(update):
+            async with semaphore:
+                response = await client.post(url, json=update)
+                return response.status_code
+
+        return await asyncio.gather(*(send(update) for update in updates))
+
+
+def main():
+    """Parse the command line and send the updates."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--url', default='http://127.0.0.1:8443/telegram',
+                        help='webhook URL of the bot')
+    parser.add_argument('--secret', help='webhook secret token')
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument('--text', help='text message to send')
+    group.add_argument('--callback', help='callback data of a button press')
+    parser.add_argument('--users', type=int, default=1,
+                        help='number of distinct fake users')
+    parser.add_argument('--count', type=int, default=1,
+                        help='number of updates to send')
+    parser.add_argument('--concurrency', type=int, default=10,
+                        help='maximum number of requests in flight')
+    args = parser.parse_args()
+
+    updates = []
+    for number in range(args.count):
+        user_id = 1_000_000 + number % args.users
+        if args.text is not None:
+            updates.append(build_message(user_id, args.text))
+        else:
+            updates.append(build_callback(user_id, args.callback))
+
+    started = time.perf_counter()
+    statuses = asyncio.run(
+        send_updates(args.url, args.secret, updates, args.concurrency))
+    elapsed = time.perf_counter() - started
+    accepted = sum(status == 200 for status in statuses)
+    print(f"Sent {len(statuses)} updates in {elapsed:.3f}s, "
+          f"{accepted} accepted")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,378 @@
+"""
+Load Test for the Family Budget Management Telegram Bot.
+
+This script measures how many users the bot can serve. It starts a local
+stand-in for the budget REST API with a configurable latency, builds the
+bot application with a stand-in for the Telegram Bot API and lets many
+synthetic users walk through complete add-transaction conversations at the
+same time. Updates go through the bot's update processor, so the
+concurrency limit and the per-user ordering apply as in production.
+
+At the end it reports the throughput and the p50/p95/p99 latency of every
+step, the requests the budget API received and whether every transaction
+was delivered by the outbox.
+
+Usage:
+    python tools/load_test.py --users 100 --conversations 5 \
+        --api-latency 50
+
+Note:
+    The bot is configured through the same environment variables as in
+    production; DATABASE_PATH defaults to a temporary directory.
+"""
+import argparse
+import asyncio
+import importlib
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from datetime import date
+
+import fake_telegram
+from telegram import Update
+from telegram.request import BaseRequest
+from tornado.httpserver import HTTPServer
+from tornado.netutil import bind_sockets
+from tornado.web import Application as WebApplication
+from tornado.web import RequestHandler
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TITLES = {
+    'Groceries': ('milk and bread', 'weekly groceries', 'vegetables'),
+    'Transport': ('taxi home', 'bus ticket', 'fuel'),
+    'Food': ('lunch', 'coffee', 'pizza delivery'),
+    'Home': ('rent', 'electricity bill', 'internet'),
+}
+FIRST_USER_ID = 1_000_000
+
+
+class FakeBudgetApi:
+    """
+    Stand-in for the budget REST API.
+
+    Users are grouped into families of ``family_size``; every family has
+    the same categories and currencies and one account per user.
+    """
+
+    def __init__(self, family_size, categories, latency):
+        """
+        Initialize the API data.
+
+        Args:
+            family_size (int): Number of users per family.
+            categories (int): Number of categories per family.
+            latency (float): Mean response latency in seconds.
+        """
+        self.family_size = family_size
+        self.latency = latency
+        names = list(TITLES)
+        self.categories = [
+            {'id': number + 1,
+             'title': (names[number] if number < len(names)
+                       else f"Category {number + 1}")}
+            for number in range(categories)]
+        self.currencies = [{'id': 1, 'code': 'EUR', 'title': 'Euro'},
+                           {'id': 2, 'code': 'USD', 'title': 'US Dollar'}]
+        self.requests = Counter()
+        self.transactions = defaultdict(list)
+        self.keys = set()
+
+    def family(self, user_id):
+        """Return the family number of ``user_id``."""
+        return (user_id - FIRST_USER_ID) // self.family_size
+
+    def members(self, family):
+        """Return the user IDs of ``family``."""
+        first = FIRST_USER_ID + family * self.family_size
+        return range(first, first + self.family_size)
+
+    def account(self, user_id):
+        """Return the account of ``user_id``."""
+        return {'id': user_id, 'title': f"Card {user_id}",
+                'owner': user_id, 'balance': '100.00', 'currency': 1}
+
+    def user(self, user_id):
+        """Return the details of ``user_id``."""
+        family = self.family(user_id)
+        return {'id': user_id, 'username': f"user{user_id}",
+                'first_name': 'Load', 'last_name': 'Test',
+                'email': f"user{user_id}@example.com", 'role': 'member',
+                'family': {'title': f"Family {family}",
+                           'members': list(self.members(family))}}
+
+    def store(self, user_id, transaction, key):
+        """Store ``transaction`` once per idempotency key."""
+        if key is not None and key in self.keys:
+            return 409
+        self.keys.add(key)
+        self.transactions[self.family(user_id)].append(transaction)
+        return 201
+
+    async def respond(self, method, path, user_id, query, body,
+                      idempotency_key=None):
+        """
+        Return the status and body of a request.
+
+        Args:
+            method (str): HTTP method.
+            path (str): Request path.
+            user_id (int): User the API token belongs to, or None.
+            query (dict): Query arguments.
+            body: Decoded JSON body, or None.
+            idempotency_key (str): Value of the Idempotency-Key header.
+        """
+        self.requests[method, path] += 1
+        await asyncio.sleep(self.latency * random.uniform(0.5, 1.5))
+        if path == '/auth/telegram/':
+            return 200, {'token': f"token-{body['telegram_userid']}"}
+        if user_id is None:
+            return 401, {'detail': 'Invalid token.'}
+        family = self.family(user_id)
+        if path == '/users/me/':
+            return 200, self.user(user_id)
+        if path == '/users/':
+            return 200, [{'id': member, 'username': f"user{member}"}
+                         for member in self.members(family)]
+        if path == '/category/':
+            return 200, self.categories
+        if path == '/currency/':
+            return 200, self.currencies
+        if path == '/account/':
+            owners = self.members(family)
+            if 'owner' in query:
+                owners = [int(query['owner'])]
+            return 200, [self.account(owner) for owner in owners]
+        if path == '/family-state/':
+            return 200, [{'title': f"Family {family}", 'current': '0.00',
+                          'currency': 'EUR'}]
+        if path == '/transaction/' and method == 'GET':
+            return 200, self.transactions[family][-500:]
+        if path == '/transaction/':
+            return self.store(user_id, body, idempotency_key), {}
+        if path == '/transaction/bulk/':
+            return 207, [{'status': self.store(
+                user_id, item, item.get('idempotency_key'))}
+                for item in body]
+        return 404, {'detail': 'Not found.'}
+
+
+class FakeApiHandler(RequestHandler):
+    """Tornado handler forwarding every request to FakeBudgetApi."""
+
+    def initialize(self, api):
+        """Keep the API the requests are answered by."""
+        self.api = api
+
+    async def _handle(self):
+        """Answer the request."""
+        authorization = self.request.headers.get('Authorization', '')
+        user_id = None
+        if authorization.startswith('Token token-'):
+            user_id = int(authorization[len('Token token-'):])
+        body = json.loads(self.request.body) if self.request.body else None
+        query = {name: self.get_query_argument(name)
+                 for name in self.request.query_arguments}
+        status, result = await self.api.respond(
+            self.request.method, self.request.path, user_id, query, body,
+            self.request.headers.get('Idempotency-Key'))
+        self.set_status(status)
+        self.set_header('Content-Type', 'application/json')
+        self.finish(json.dumps(result))
+
+    get = post = _handle
+
+
+class FakeTelegramRequest(BaseRequest):
+    """Stand-in for the Telegram Bot API answering every method locally."""
+
+    def __init__(self, latency):
+        """
+        Initialize the stand-in.
+
+        Args:
+            latency (float): Mean response latency in seconds.
+        """
+        self.latency = latency
+        self.methods = Counter()
+
+    async def initialize(self):
+        """Do nothing, there is no connection to open."""
+
+    async def shutdown(self):
+        """Do nothing, there is no connection to close."""
+
+    @property
+    def read_timeout(self):
+        """Return the default read timeout."""
+        return 5.0
+
+    async def do_request(self, url, method, request_data=None,
+                         read_timeout=None, write_timeout=None,
+                         connect_timeout=None, pool_timeout=None):
+        """Answer a Bot API call with a plausible result."""
+        name = url.rsplit('/', 1)[1]
+        self.methods[name] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency * random.uniform(0.5, 1.5))
+        parameters = request_data.parameters if request_data else {}
+        if name == 'getMe':
+            result = {'id': 1, 'is_bot': True, 'first_name': 'Bot',
+                      'username': 'load_test_bot'}
+        elif name in ('sendMessage', 'editMessageText',
+                      'editMessageReplyMarkup'):
+            chat_id = parameters.get('chat_id', 1)
+            result = {'message_id': 1, 'date': int(time.time()),
+                      'chat': {'id': chat_id, 'type': 'private'},
+                      'text': parameters.get('text', '')}
+        else:
+            result = True
+        return 200, json.dumps({'ok': True, 'result': result}).encode()
+
+
+def conversation(api, encode, user_id, today):
+    """Return the (step, update) pairs of one add-transaction conversation."""
+    category = random.choice(api.categories[:len(TITLES)])
+    title = random.choice(TITLES[category['title']])
+    callback = fake_telegram.build_callback
+    message = fake_telegram.build_message
+    return [
+        ('start', message(user_id, '/start')),
+        ('add_transaction', callback(user_id, encode('add_transaction'))),
+        ('title', message(user_id, title)),
+        ('category', callback(user_id, encode('category', category['id']))),
+        ('who', callback(user_id, encode('who', user_id))),
+        ('account', callback(user_id, encode('account', user_id))),
+        ('amount', message(user_id, f"{random.uniform(1, 100):.2f}")),
+        ('currency', callback(user_id, encode('currency', 1))),
+        ('date', callback(user_id, encode(
+            'calendar_day', today.year, today.month, today.day))),
+        ('account_status', callback(user_id, encode('account_status'))),
+    ]
+
+
+async def simulate_user(application, api, encode, user_id, conversations,
+                        think_time, timings):
+    """Walk ``user_id`` through ``conversations`` conversations."""
+    processor = application.update_processor
+    for _ in range(conversations):
+        for step, data in conversation(api, encode, user_id, date.today()):
+            update = Update.de_json(data, application.bot)
+            started = time.perf_counter()
+            await processor.process_update(
+                update, application.process_update(update))
+            timings[step].append(time.perf_counter() - started)
+            if think_time:
+                await asyncio.sleep(random.uniform(0, 2 * think_time))
+
+
+def percentile(values, percent):
+    """Return the nearest-rank ``percent`` percentile of sorted values."""
+    index = round(percent / 100 * (len(values) - 1))
+    return values[min(len(values) - 1, max(0, index))]
+
+
+def report(timings, elapsed, api, telegram, expected):
+    """Print the results of the run."""
+    updates = sum(len(values) for values in timings.values())
+    print(f"{updates} updates in {elapsed:.2f}s: "
+          f"{updates / elapsed:.1f} updates/s, "
+          f"{len(timings['date']) / elapsed:.1f} conversations/s")
+    print(f"{'step':<16}{'count':>7}{'mean ms':>10}{'p50 ms':>9}"
+          f"{'p95 ms':>9}{'p99 ms':>9}")
+    for step, values in timings.items():
+        values = sorted(value * 1000 for value in values)
+        print(f"{step:<16}{len(values):>7}"
+              f"{sum(values) / len(values):>10.1f}"
+              f"{percentile(values, 50):>9.1f}"
+              f"{percentile(values, 95):>9.1f}"
+              f"{percentile(values, 99):>9.1f}")
+    print("Budget API requests:")
+    for (method, path), count in sorted(api.requests.items()):
+        print(f"  {method:<5}{path:<22}{count:>7}")
+    print("Telegram API calls: " + ", ".join(
+        f"{name} {count}" for name, count in sorted(
+            telegram.methods.items())))
+    stored = sum(len(items) for items in api.transactions.values())
+    print(f"Transactions delivered: {stored} of {expected}")
+
+
+async def run(args):
+    """Start the stand-ins, run the simulated users and report."""
+    api = FakeBudgetApi(args.family_size, args.categories,
+                        args.api_latency / 1000)
+    sockets = bind_sockets(0, '127.0.0.1')
+    server = HTTPServer(WebApplication(
+        [(r'/.*', FakeApiHandler, {'api': api})]))
+    server.add_sockets(sockets)
+    port = sockets[0].getsockname()[1]
+
+    os.environ['API_BASE_URL'] = f"http://127.0.0.1:{port}"
+    os.environ['API_TOKEN'] = 'load-test'
+    os.environ['TELEGRAM_TOKEN'] = '1:load-test'
+    os.environ.setdefault('METRICS_PORT', '0')
+    os.environ.setdefault('DATABASE_PATH', os.path.join(
+        tempfile.mkdtemp(prefix='bot-load-test-'), 'bot.sqlite3'))
+    sys.path.insert(0, ROOT)
+    bot = importlib.import_module('main')
+    logging.getLogger().setLevel(args.log_level)
+    logging.getLogger('tornado.access').setLevel(logging.ERROR)
+    encode = importlib.import_module('modules.callbacks').encode
+
+    telegram = FakeTelegramRequest(args.telegram_latency / 1000)
+    application = bot.build_application(request=telegram)
+    timings = defaultdict(list)
+    async with application:
+        await bot.post_init(application)
+        await application.start()
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            simulate_user(application, api, encode, FIRST_USER_ID + number,
+                          args.conversations, args.think_time / 1000,
+                          timings)
+            for number in range(args.users)))
+        elapsed = time.perf_counter() - started
+
+        outbox = application.bot_data['outbox']
+        deadline = time.monotonic() + args.drain_timeout
+        while outbox.pending_count() and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+        await application.stop()
+    await bot.shutdown(application)
+    server.stop()
+
+    report(timings, elapsed, api, telegram,
+           args.users * args.conversations)
+
+
+def main():
+    """Parse the command line and run the load test."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--users', type=int, default=50,
+                        help='number of simulated users')
+    parser.add_argument('--conversations', type=int, default=3,
+                        help='conversations per user')
+    parser.add_argument('--family-size', type=int, default=4,
+                        help='users per family')
+    parser.add_argument('--categories', type=int, default=30,
+                        help='categories per family')
+    parser.add_argument('--api-latency', type=float, default=50,
+                        help='mean budget API latency in milliseconds')
+    parser.add_argument('--telegram-latency', type=float, default=0,
+                        help='mean Telegram API latency in milliseconds')
+    parser.add_argument('--think-time', type=float, default=0,
+                        help='mean pause between steps in milliseconds')
+    parser.add_argument('--drain-timeout', type=float, default=30,
+                        help='seconds to wait for the outbox to deliver')
+    parser.add_argument('--log-level', default='WARNING',
+                        help='log level of the bot during the test')
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()